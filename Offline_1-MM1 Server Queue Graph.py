@@ -6,9 +6,16 @@ ro is defined as the ratio of arrival rate vs service rate.
 For the sake of comparison, while plotting results from simulation, also produce the analytical results.
 """
 
-import heapq
-import random
-import matplotlib.pyplot as plt
+from simkit.accumulators import Tally, TimeAverage
+from simkit.cache import CachedModel, ResultCache
+from simkit.engine import Engine, EXIT, START, ARRIVAL, DEPARTURE
+from simkit.output_analysis import BatchMeansAnalyzer
+from simkit.plotting import render
+from simkit.queues import FIFOQueue
+from simkit.recursions import lindley, queue_summary
+from simkit.replication import run_replications
+from simkit.results import ResultStore, new_run_id, select, summary_row
+from simkit.variates import spawn_streams
 
 inf = 10000000000
 total_people = 80000
@@ -23,32 +30,24 @@ class Params:
 
 class States:
     def __init__(self):
-        self.queue = []
-        self.people_in_queue = 0
-        self.total_area_in_queue = 0.0
+        self.queue = FIFOQueue()
         self.total_people_enter_queue = 0
 
         self.server_status = False
-        self.last_event_time = 0
-        self.total_delay = 0.0
-        self.total_served_time = 0.0
+        self.busy = TimeAverage()
+        self.delay = Tally()
+        self.delay_analysis = BatchMeansAnalyzer()
 
         self.util = 0.0
         self.avgQdelay = 0.0
         self.avgQlength = 0.0
         self.served = 0
 
-    def update(self, sim, event):
-        last_event_duration = event.eventTime - self.last_event_time
-        self.total_area_in_queue += self.people_in_queue * last_event_duration
-        self.last_event_time = event.eventTime
-        if self.server_status:
-            self.total_served_time += last_event_duration
-
     def finish(self, sim):
-        self.avgQdelay = self.total_delay / self.served
-        self.avgQlength = self.total_area_in_queue / sim.now()
-        self.util = self.total_served_time / sim.now()
+        self.served = self.delay.count
+        self.avgQdelay = self.delay.mean
+        self.avgQlength = self.queue.time_average(sim.now())
+        self.util = self.busy.mean(sim.now())
 
     def printResults(self, sim):
         # DO NOT CHANGE THESE LINES
@@ -62,133 +61,103 @@ class States:
         return self.avgQlength, self.avgQdelay, self.util
 
 
-class Event:
-    def __init__(self, sim):
-        self.eventType = None
-        self.sim = sim
-        self.eventTime = None
-
-    def process(self, sim):
-        raise Exception('Unimplemented process method for the event!')
-
-    def __repr__(self):
-        return self.eventType
-
-
-class StartEvent(Event):
-    def __init__(self, eventTime, sim):
-        super().__init__(sim)
-        self.eventTime = eventTime
-        self.eventType = 'START'
-        self.sim = sim
-
-    def process(self, sim):
-        sim.states.total_people_enter_queue += 1
-        exp = random.expovariate(sim.params.lambd)
-        self.sim.scheduleEvent(ArrivalEvent(self.eventTime + exp, self.sim))
-        self.sim.scheduleEvent(ExitEvent(inf, self.sim))
-
-
-class ExitEvent(Event):
-    def __init__(self, eventTime, sim):
-        super().__init__(sim)
-        self.eventTime = eventTime
-        self.eventType = 'EXIT'
-        self.sim = sim
-
-    def process(self, sim):
-        None
-
-
-class ArrivalEvent(Event):
-    def __init__(self, eventTime, sim):
-        super().__init__(sim)
-        self.eventTime = eventTime
-        self.eventType = 'ARRIVAL'
-        self.sim = sim
-
-    def process(self, sim):
-        if sim.states.total_people_enter_queue < total_people:
-            sim.states.total_people_enter_queue += 1
-            exp = random.expovariate(sim.params.lambd)
-            self.sim.scheduleEvent(ArrivalEvent(sim.now() + exp, self.sim))
-
-        if sim.states.server_status:
-            sim.states.people_in_queue += 1
-            sim.states.queue.append(sim.now())
-        else:
-            sim.states.server_status = True
-            sim.states.served += 1
-            exp = random.expovariate(sim.params.mu)
-            sim.scheduleEvent(DepartureEvent(sim.now() + exp, sim))
-
-
-class DepartureEvent(Event):
-    def __init__(self, eventTime, sim):
-        super().__init__(sim)
-        self.eventTime = eventTime
-        self.eventType = 'DEPARTURE'
-        self.sim = sim
-
-    def process(self, sim):
-        if sim.states.people_in_queue == 0:
-            sim.states.server_status = False
-        else:
-            sim.states.people_in_queue -= 1
-            sim.states.total_delay += (sim.now() - sim.states.queue[0])
-            sim.states.queue.pop(0)
-            sim.states.served += 1
-            expo = random.expovariate(sim.params.mu)
-            sim.scheduleEvent(DepartureEvent(sim.now() + expo, sim))
-
-
 class Simulator:
-    def __init__(self, seed):
-        self.eventQ = []
-        self.simclock = 0
+    def __init__(self, seed, event_list='heap', fast=False):
+        self.engine = Engine(event_list=event_list)
         self.seed = seed
+        self.fast = fast
         self.params = None
         self.states = None
+        self.arrivals = None
+        self.services = None
+
+        self.engine.register(START, self.start)
+        self.engine.register(ARRIVAL, self.arrival)
+        self.engine.register(DEPARTURE, self.departure)
 
     def initialize(self):
-        self.simclock = 0
-        self.scheduleEvent(StartEvent(0, self))
+        self.engine.clock = 0
+        self.engine.schedule(0, START)
 
     def configure(self, params, states):
         self.params = params
         self.states = states
 
     def now(self):
-        return self.simclock
-
-    def scheduleEvent(self, event):
-        heapq.heappush(self.eventQ, (event.eventTime, event))
+        return self.engine.clock
+
+    def start(self, data):
+        self.states.total_people_enter_queue += 1
+        exp = self.arrivals.expovariate(self.params.lambd)
+        self.engine.schedule(self.now() + exp, ARRIVAL)
+        self.engine.schedule(inf, EXIT)
+
+    def arrival(self, data):
+        states = self.states
+        now = self.engine.clock
+        if states.total_people_enter_queue < total_people:
+            states.total_people_enter_queue += 1
+            exp = self.arrivals.expovariate(self.params.lambd)
+            self.engine.schedule(now + exp, ARRIVAL)
+
+        if states.server_status:
+            states.queue.push(now, now)
+        else:
+            states.server_status = True
+            states.busy.update(1, now)
+            states.delay.add(0.0)
+            states.delay_analysis.add(0.0)
+            exp = self.services.expovariate(self.params.mu)
+            self.engine.schedule(now + exp, DEPARTURE)
+
+    def departure(self, data):
+        states = self.states
+        now = self.engine.clock
+        if not states.queue:
+            states.server_status = False
+            states.busy.update(0, now)
+        else:
+            delay = now - states.queue.pop(now)
+            states.delay.add(delay)
+            states.delay_analysis.add(delay)
+            expo = self.services.expovariate(self.params.mu)
+            self.engine.schedule(now + expo, DEPARTURE)
 
     def run(self):
-        random.seed(self.seed)
+        self.arrivals, self.services = spawn_streams(self.seed, 2)
+        if self.fast:
+            self.run_fast()
+            return
         self.initialize()
-
-        while len(self.eventQ) > 0:
-            time, event = heapq.heappop(self.eventQ)
-
-            if event.eventType == 'EXIT':
-                break
-
-            if self.states is not None:
-                self.states.update(self, event)
-
-            # print(event.eventTime, 'Event', event)
-            self.simclock = event.eventTime
-            event.process(self)
-
+        self.engine.run()
         self.states.finish(self)
 
+    def run_fast(self):
+        # FCFS with one server: every delay follows from the Lindley recursion,
+        # using the same arrival and service streams as the event-driven run.
+        interarrivals = self.arrivals.expovariate_array(total_people, self.params.lambd)
+        services = self.services.expovariate_array(total_people, self.params.mu)
+        delays = lindley(interarrivals, services)
+        summary = queue_summary(interarrivals, services, delays)
+        self.states.delay.extend(delays)
+        self.states.delay_analysis.extend(delays)
+
+        self.engine.clock = summary['end_time']
+        self.states.served = summary['served']
+        self.states.total_people_enter_queue = summary['served']
+        self.states.avgQlength = summary['avgQlength']
+        self.states.avgQdelay = summary['avgQdelay']
+        self.states.util = summary['util']
+
     def printResults(self):
         self.states.printResults(self)
 
     def getResults(self):
         return self.states.getResults(self)
 
+    def steadyStateResults(self):
+        return self.states.delay_analysis.result()
+
     def print_analytical_results(self):
         avgQlength = (self.params.lambd * self.params.lambd) / (self.params.mu * (self.params.mu - self.params.lambd))
         avgQdelay = self.params.lambd / (self.params.mu * (self.params.mu - self.params.lambd))
@@ -199,43 +168,43 @@ class Simulator:
         print('Analytical Time-average server utility: %lf' % util)
 
 
-def experiment2():
+def simulate(point, seed):
+    params, fast = point
+    sim = Simulator(seed, fast=fast)
+    sim.configure(params, States())
+    sim.run()
+    length, delay, utl = sim.getResults()
+    return {'avgQlength': length, 'avgQdelay': delay, 'util': utl}
+
+
+def printSummary(params, summary):
+    print('MMk Results: lambda = %lf, mu = %lf, k = %d, replications = %d' % (params.lambd, params.mu, params.k, summary['util'].n))
+    print('MMk Average queue length: %lf +- %lf' % (summary['avgQlength'].mean, summary['avgQlength'].half_width))
+    print('MMk Average customer delay in queue: %lf +- %lf' % (summary['avgQdelay'].mean, summary['avgQdelay'].half_width))
+    print('MMk Time-average server utility: %lf +- %lf\n' % (summary['util'].mean, summary['util'].half_width))
+
+
+def experiment2(fast=True, replications=5, workers=None, results='experiment2.csv', image='experiment2.png', cache='.simcache'):
     seed = 110
     mu = 1000.0 / 60
     ratios = [u / 10.0 for u in range(1, 11)]
 
-    avglength = []
-    avgdelay = []
-    util = []
-
-    for ro in ratios:
-        sim = Simulator(seed)
-        sim.configure(Params(mu * ro, mu, 1), States())
-        sim.run()
-        sim.printResults()
-
-        length, delay, utl = sim.getResults()
-        avglength.append(length)
-        avgdelay.append(delay)
-        util.append(utl)
-
-    plt.figure(1)
-    plt.subplot(311)
-    plt.plot(ratios, avglength)
-    plt.xlabel('Ratio (ro)')
-    plt.ylabel('Avg Q length')
-
-    plt.subplot(312)
-    plt.plot(ratios, avgdelay)
-    plt.xlabel('Ratio (ro)')
-    plt.ylabel('Avg Q delay (sec)')
-
-    plt.subplot(313)
-    plt.plot(ratios, util)
-    plt.xlabel('Ratio (ro)')
-    plt.ylabel('Util')
-
-    plt.show()
+    store = ResultStore(results)  # read the stored header before the sweep
+    run = new_run_id()
+    rows = []
+
+    # Points (and replications) already in the cache are not simulated again.
+    model = simulate if cache is None else CachedModel(simulate, ResultCache(cache), total_people=total_people)
+
+    points = [(Params(mu * ro, mu, 1), fast) for ro in ratios]
+    for (params, fast), summary in zip(points, run_replications(model, points, replications, seed, workers)):
+        printSummary(params, summary)
+        row = summary_row(run, seed, params, summary)
+        row['ro'] = params.lambd / params.mu
+        rows.append(row)
+
+    store.extend(rows)
+    render(select(store.load(), run=run), 'ro', [('avgQlength', 'Avg Q length'), ('avgQdelay', 'Avg Q delay (sec)'), ('util', 'Util')], image, xlabel='Ratio (ro)')
 
 
 def main():
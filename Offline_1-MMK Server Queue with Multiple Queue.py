@@ -6,9 +6,18 @@ ro is defined as the ratio of arrival rate vs service rate.
 For the sake of comparison, while plotting results from simulation, also produce the analytical results.
 """
 
-import heapq
-import random
-import matplotlib.pyplot as plt
+from simkit.accumulators import Tally
+from simkit.analytical import mmk
+from simkit.engine import Engine, EXIT, START, ARRIVAL, DEPARTURE
+from simkit.indexes import ShortestQueueIndex
+from simkit.output_analysis import BatchMeansAnalyzer
+from simkit.plotting import render
+from simkit.queues import FIFOQueue
+from simkit.replication import run_replications
+from simkit.results import ResultStore, new_run_id, select, summary_row
+from simkit.servers import IdleServerPool
+from simkit.sketches import KLLSketch, QUANTILES
+from simkit.variates import spawn_streams
 
 inf = 10000000000
 total_people = 80000
@@ -24,31 +33,25 @@ class Params:
 class States:
     def __init__(self):
         self.queue = []
-        self.total_area_in_queue = 0.0
-        self.people_in_queue = 0
         self.total_people_enter_queue = 0
 
-        self.server_status = []
-        self.available_server = 0
-        self.last_event_time = 0
-        self.total_delay = 0.0
-        self.total_served_time = 0.0
+        self.shortest = None
+        self.k = 1
+        self.servers = None
+        self.delay = Tally()
+        self.delay_sketch = []
+        self.delay_analysis = BatchMeansAnalyzer()
 
         self.util = 0.0
+        self.server_util = []
         self.avgQdelay = 0.0
         self.avgQlength = 0.0
 
-    def update(self, sim, event):
-        busy_server = sim.params.k - self.available_server
-        last_event_duration = event.eventTime - self.last_event_time
-        self.total_area_in_queue += (sim.states.people_in_queue / sim.params.k) * last_event_duration
-        self.last_event_time = event.eventTime
-        self.total_served_time += last_event_duration * (busy_server / sim.params.k)
-
     def finish(self, sim):
-        self.avgQdelay = self.total_delay / self.total_people_enter_queue
-        self.avgQlength = self.total_area_in_queue / sim.now()
-        self.util = self.total_served_time / sim.now()
+        self.avgQdelay = self.delay.mean
+        self.avgQlength = sum(queue.time_average(sim.now()) for queue in self.queue) / self.k
+        self.server_util = self.servers.utilization(sim.now())
+        self.util = float(self.server_util.mean())
 
     def printResults(self, sim):
         # DO NOT CHANGE THESE LINES
@@ -62,151 +65,97 @@ class States:
         return self.avgQlength, self.avgQdelay, self.util
 
 
-class Event:
-    def __init__(self, sim):
-        self.eventType = None
-        self.sim = sim
-        self.eventTime = None
-
-    def process(self, sim):
-        raise Exception('Unimplemented process method for the event!')
-
-    def __repr__(self):
-        return self.eventType
-
-
-class StartEvent(Event):
-    def __init__(self, eventTime, sim):
-        super().__init__(sim)
-        self.eventTime = eventTime
-        self.eventType = 'START'
-        self.sim = sim
-
-    def process(self, sim):
-        sim.states.total_people_enter_queue += 1
-        exp = random.expovariate(sim.params.lambd)
-        self.sim.scheduleEvent(ArrivalEvent(self.eventTime + exp, self.sim))
-        self.sim.scheduleEvent(ExitEvent(inf, self.sim))
-
-
-class ExitEvent(Event):
-    def __init__(self, eventTime, sim):
-        super().__init__(sim)
-        self.eventTime = eventTime
-        self.eventType = 'EXIT'
-        self.sim = sim
-
-    def process(self, sim):
-        None
-
-
-class ArrivalEvent(Event):
-    def __init__(self, eventTime, sim):
-        super().__init__(sim)
-        self.eventTime = eventTime
-        self.eventType = 'ARRIVAL'
-        self.sim = sim
-
-    def process(self, sim):
-        if sim.states.total_people_enter_queue < total_people:
-            sim.states.total_people_enter_queue += 1
-            exp = random.expovariate(sim.params.lambd)
-            self.sim.scheduleEvent(ArrivalEvent(sim.now() + exp, self.sim))
-
-        if sim.states.available_server == 0:
-            left_most_shortest = 0
-            for i in range(sim.params.k):
-                if len(sim.states.queue[i]) < len(sim.states.queue[left_most_shortest]):
-                    left_most_shortest = i
-            sim.states.queue[left_most_shortest].append(self.eventTime)
-            sim.states.people_in_queue += 1
-        else:
-            for i in range(sim.params.k):
-                if not sim.states.server_status[i]:
-                    sim.states.available_server -= 1
-                    sim.states.server_status[i] = True
-                    exp = random.expovariate(sim.params.mu)
-                    sim.scheduleEvent(DepartureEvent(sim.now() + exp, sim, i))
-                    break
-
-
-class DepartureEvent(Event):
-    def __init__(self, eventTime, sim, serverNo):
-        super().__init__(sim)
-        self.eventTime = eventTime
-        self.eventType = 'DEPARTURE'
-        self.sim = sim
-        self.serverNo = serverNo
-
-    def process(self, sim):
-        l = len(sim.states.queue[self.serverNo])
-        lf = len(sim.states.queue[self.serverNo - 1]) if self.serverNo > 0 else -1
-        lr = len(sim.states.queue[self.serverNo + 1]) if self.serverNo < (sim.params.k - 1) else -1
-        while lf >= 0 and (lf - l) >= 2:
-            tail = sim.states.queue[self.serverNo - 1].pop()
-            sim.states.queue[self.serverNo].append(tail)
-            l += 1
-            lf -= 1
-        while lr >= 0 and (lr - l) >= 2:
-            tail = sim.states.queue[self.serverNo + 1].pop()
-            sim.states.queue[self.serverNo].append(tail)
-            l += 1
-            lr -= 1
-        if len(sim.states.queue[self.serverNo]) == 0:
-            sim.states.available_server += 1
-            sim.states.server_status[self.serverNo] = False
-        else:
-            sim.states.server_status[self.serverNo] = True
-            sim.states.total_delay += (sim.now() - sim.states.queue[self.serverNo][0])
-            sim.states.people_in_queue -= 1
-            sim.states.queue[self.serverNo].pop(0)
-            expo = random.expovariate(sim.params.mu)
-            sim.scheduleEvent(DepartureEvent(sim.now() + expo, sim, self.serverNo))
-
-
 class Simulator:
-    def __init__(self, seed):
-        self.eventQ = []
-        self.simclock = 0
+    def __init__(self, seed, event_list='heap'):
+        self.engine = Engine(event_list=event_list)
         self.seed = seed
         self.params = None
         self.states = None
+        self.arrivals = None
+        self.services = None
+
+        self.engine.register(START, self.start)
+        self.engine.register(ARRIVAL, self.arrival)
+        self.engine.register(DEPARTURE, self.departure)
 
     def initialize(self):
-        self.simclock = 0
-        self.scheduleEvent(StartEvent(0, self))
+        self.engine.clock = 0
+        self.engine.schedule(0, START)
 
     def configure(self, params, states):
         self.params = params
         self.states = states
-        self.states.available_server = self.params.k
+        self.states.k = self.params.k
+        self.states.servers = IdleServerPool(self.params.k)
+        self.states.shortest = ShortestQueueIndex(self.params.k)
         for i in range(self.params.k):
-            self.states.queue.append([])
-            self.states.server_status.append(False)
+            self.states.queue.append(FIFOQueue())
+            self.states.delay_sketch.append(KLLSketch(seed=self.seed))
 
     def now(self):
-        return self.simclock
-
-    def scheduleEvent(self, event):
-        heapq.heappush(self.eventQ, (event.eventTime, event))
+        return self.engine.clock
+
+    def start(self, data):
+        self.states.total_people_enter_queue += 1
+        exp = self.arrivals.expovariate(self.params.lambd)
+        self.engine.schedule(self.now() + exp, ARRIVAL)
+        self.engine.schedule(inf, EXIT)
+
+    def arrival(self, data):
+        states = self.states
+        now = self.engine.clock
+        if states.total_people_enter_queue < total_people:
+            states.total_people_enter_queue += 1
+            exp = self.arrivals.expovariate(self.params.lambd)
+            self.engine.schedule(now + exp, ARRIVAL)
+
+        if not states.servers:
+            left_most_shortest = states.shortest.shortest()
+            states.queue[left_most_shortest].push(now, now)
+            states.shortest.update(left_most_shortest, len(states.queue[left_most_shortest]))
+        else:
+            i = states.servers.acquire(now)
+            states.delay.add(0.0)
+            states.delay_sketch[i].add(0.0)
+            states.delay_analysis.add(0.0)
+            exp = self.services.expovariate(self.params.mu)
+            self.engine.schedule(now + exp, DEPARTURE, i)
+
+    def departure(self, serverNo):
+        states = self.states
+        now = self.engine.clock
+        queue = states.queue
+        if serverNo > 0:
+            self.jockey(serverNo - 1, serverNo, now)
+        if serverNo < self.params.k - 1:
+            self.jockey(serverNo + 1, serverNo, now)
+        if not queue[serverNo]:
+            states.servers.release(serverNo, now)
+        else:
+            delay = now - queue[serverNo].pop(now)
+            states.shortest.update(serverNo, len(queue[serverNo]))
+            states.delay.add(delay)
+            states.delay_sketch[serverNo].add(delay)
+            states.delay_analysis.add(delay)
+            expo = self.services.expovariate(self.params.mu)
+            self.engine.schedule(now + expo, DEPARTURE, serverNo)
+
+    def jockey(self, source, target, now):
+        # Customers move from the tail of `source` to `target` while `source`
+        # is at least two longer.
+        queue = self.states.queue
+        moves = (len(queue[source]) - len(queue[target])) // 2
+        if moves <= 0:
+            return
+        for _ in range(moves):
+            queue[target].push(queue[source].steal_tail(now), now)
+        self.states.shortest.update(source, len(queue[source]))
+        self.states.shortest.update(target, len(queue[target]))
 
     def run(self):
-        random.seed(self.seed)
+        self.arrivals, self.services = spawn_streams(self.seed, 2)
         self.initialize()
-
-        while len(self.eventQ) > 0:
-            time, event = heapq.heappop(self.eventQ)
-
-            if event.eventType == 'EXIT':
-                break
-
-            if self.states is not None:
-                self.states.update(self, event)
-
-            # print(event.eventTime, 'Event', event)
-            self.simclock = event.eventTime
-            event.process(self)
-
+        self.engine.run()
         self.states.finish(self)
 
     def printResults(self):
@@ -215,55 +164,62 @@ class Simulator:
     def getResults(self):
         return self.states.getResults(self)
 
+    def steadyStateResults(self):
+        return self.states.delay_analysis.result()
+
     def print_analytical_results(self):
-        avgQlength = (self.params.lambd * self.params.lambd) / (self.params.mu * (self.params.mu - self.params.lambd))
-        avgQdelay = self.params.lambd / (self.params.mu * (self.params.mu - self.params.lambd))
-        util = self.params.lambd / self.params.mu
-        print('\nAnalytical Results: lambda = %lf, mu = %lf, k = %d' % (self.params.lambd, self.params.mu, self.params.k))
-        print('Analytical Average queue length: %lf' % avgQlength)
-        print('Analytical Average customer delay in queue: %lf' % avgQdelay)
-        print('Analytical Time-average server utility: %lf' % util)
+        print()
+        printAnalytical(self.params, mmk(self.params.lambd, self.params.mu, self.params.k))
+
+
+def simulate(point, seed):
+    params = point
+    sim = Simulator(seed)
+    sim.configure(params, States())
+    sim.run()
+    length, delay, utl = sim.getResults()
+    return {'avgQlength': length, 'avgQdelay': delay, 'util': utl, 'server_util': sim.states.server_util, 'delay_sketch': sim.states.delay_sketch}
+
+
+def printAnalytical(params, analytic):
+    print('Analytical Results: lambda = %lf, mu = %lf, k = %d' % (params.lambd, params.mu, params.k))
+    print('Analytical Average queue length: %lf' % analytic['avgQlength'])
+    print('Analytical Average customer delay in queue: %lf' % analytic['avgQdelay'])
+    print('Analytical Time-average server utility: %lf\n' % analytic['util'])
+
+
+def printSummary(params, summary):
+    print('MMk Results: lambda = %lf, mu = %lf, k = %d, replications = %d' % (params.lambd, params.mu, params.k, summary['util'].n))
+    print('MMk Average queue length: %lf +- %lf' % (summary['avgQlength'].mean, summary['avgQlength'].half_width))
+    print('MMk Average customer delay in queue: %lf +- %lf' % (summary['avgQdelay'].mean, summary['avgQdelay'].half_width))
+    print('MMk Time-average server utility: %lf +- %lf' % (summary['util'].mean, summary['util'].half_width))
+    for i, sketch in enumerate(summary['delay_sketch']):
+        print('MMk Server %d utility: %lf, delay in queue P50 / P95 / P99: %lf / %lf / %lf' % ((i, summary['server_util'].mean[i]) + tuple(sketch.quantiles(QUANTILES))))
+    print()
 
 
-def experiment4():
+def experiment4(replications=5, workers=None, results='experiment4.csv', image='experiment4.png'):
     seed = 110
     lambd = 5.0 / 60
     mu = 8.0 / 60
 
-    avglength = []
-    avgdelay = []
-    util = []
-    server = []
-
-    for k in range(1, 5, 1):
-        sim = Simulator(seed)
-        sim.configure(Params(lambd, mu, k), States())
-        sim.run()
-        sim.printResults()
-
-        length, delay, utl = sim.getResults()
-        avglength.append(length)
-        avgdelay.append(delay)
-        util.append(utl)
-        server.append(k)
-
-    plt.figure(1)
-    plt.subplot(311)
-    plt.plot(server, avglength)
-    plt.xlabel('Server (k)')
-    plt.ylabel('Avg Q length')
-
-    plt.subplot(312)
-    plt.plot(server, avgdelay)
-    plt.xlabel('Server (k)')
-    plt.ylabel('Avg Q delay (sec)')
-
-    plt.subplot(313)
-    plt.plot(server, util)
-    plt.xlabel('Server (k)')
-    plt.ylabel('Util')
-
-    plt.show()
+    store = ResultStore(results)  # read the stored header before the sweep
+    run = new_run_id()
+    rows = []
+
+    points = [Params(lambd, mu, k) for k in range(1, 5, 1)]
+    # Erlang C is exact for one shared queue; with jockeying between the
+    # per-server queues it is the benchmark the model should come close to.
+    analytic = mmk(lambd, mu, [params.k for params in points])
+    for i, (params, summary) in enumerate(zip(points, run_replications(simulate, points, replications, seed, workers))):
+        printSummary(params, summary)
+        printAnalytical(params, {name: value[i] for name, value in analytic.items()})
+        row = summary_row(run, seed, params, summary)
+        row.update(('analytic_' + name, float(value[i])) for name, value in analytic.items())
+        rows.append(row)
+
+    store.extend(rows)
+    render(select(store.load(), run=run), 'k', [('avgQlength', 'Avg Q length', 'analytic_avgQlength'), ('avgQdelay', 'Avg Q delay (sec)', 'analytic_avgQdelay'), ('util', 'Util', 'analytic_util')], image, xlabel='Server (k)')
 
 
 def main():
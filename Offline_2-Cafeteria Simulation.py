@@ -1,7 +1,15 @@
-import heapq
 import numpy as np
-import time
-import copy
+from collections import namedtuple
+
+from simkit.accumulators import Tally, TimeAverage
+from simkit.cache import CachedModel, ResultCache
+from simkit.engine import Engine, EXIT, START, ARRIVAL, DEPARTURE
+from simkit.customers import CustomerTable, DEFAULT_COLUMNS
+from simkit.indexes import ShortestQueueIndex
+from simkit.queues import FIFOQueue
+from simkit.replication import run_tasks
+from simkit.sketches import KLLSketch, QUANTILES
+from simkit.variates import AliasTable, VariateStream
 
 # 0 - hot_food
 # 1 - sandwitch
@@ -9,7 +17,6 @@ import copy
 # 3 - cash
 
 mu = 30
-num_of_server = []
 total_sim_time = 5400
 
 group_size = [1, 2, 3, 4]
@@ -21,19 +28,43 @@ routes_probabilities = [0.80, 0.15, 0.05]
 act = [[20, 40], [5, 15], [0, 0], [5, 10]]
 st = [[50, 120], [60, 180], [0, 0], [5, 20]]
 
+customer_columns = DEFAULT_COLUMNS + (('line', np.int32),)
+
 expansion_possibilities = [[1, 1, 5, 2], [1, 1, 5, 3], [1, 2, 5, 2], [1, 2, 5, 3], [2, 1, 5, 2], [2, 1, 5, 3], [2, 2, 5, 2], [2, 2, 5, 3]]
 
+# Everything one run depends on besides the seed. It holds only tuples and
+# read-only alias tables compiled from the probability lists, so a run cannot
+# change it and it can be shared by concurrent runs, sent to worker processes
+# and used as a cache key.
+CafeteriaConfig = namedtuple('CafeteriaConfig', ['num_of_server', 'mu', 'total_sim_time', 'group_size', 'group_size_probabilities',
+                                                 'routing', 'routes_probabilities', 'act', 'st', 'group_size_table', 'route_table'])
+
+
+def make_config(num_of_server):
+    return CafeteriaConfig(
+        tuple(num_of_server), mu, total_sim_time, tuple(group_size), tuple(group_size_probabilities),
+        tuple(map(tuple, routing)), tuple(routes_probabilities), tuple(map(tuple, act)), tuple(map(tuple, st)),
+        AliasTable(group_size_probabilities), AliasTable(routes_probabilities),
+    )
+
 
 class States:
-    def __init__(self):
+    def __init__(self, config, seed=None):
+        self.config = config
         self.total_num_of_group = 0
-        self.num_of_customers_in_system = 0
+        self.customers_in_system = TimeAverage()
         self.is_new_group = {}
-        self.queue = [[[]], [[]], [[]], []]
-        self.num_of_server = num_of_server
+        self.queue = [[FIFOQueue()], [FIFOQueue()], [FIFOQueue()], []]
+        self.num_of_server = list(config.num_of_server)  # free servers, changes during the run
 
         for i in range(self.num_of_server[3]):
-            self.queue[3].append([])
+            self.queue[3].append(FIFOQueue())
+        self.shortest = [ShortestQueueIndex(len(lines)) for lines in self.queue]
+
+        self.queue_delay = [Tally() for i in range(4)]
+        self.delay_sketch = [KLLSketch(seed=seed) for i in range(4)]
+        self.route_delay = [Tally() for i in range(3)]
+        self.total_customer_served_by_this_route = [0, 0, 0]
 
         self.avg_route_delay = [0.0, 0.0, 0.0]
         self.avg_queue_delay = [0.0, 0.0, 0.0, 0.0]
@@ -43,47 +74,60 @@ class States:
         self.max_customer_in_the_system = 0
         self.max_route_delay = [0.0, 0.0, 0.0]
         self.max_queue_delay = [0.0, 0.0, 0.0, 0.0]
-        self.max_queue_length = [0.0, 0.0, 0.0, 0.0]
-        self.total_customer_served_by_this_route = [0, 0, 0]
+        self.max_queue_length = [0, 0, 0, 0]
+        self.delay_quantiles = [[0.0, 0.0, 0.0] for i in range(4)]
 
-        self.time_last_event = 0
         self.overall_avg_delay = 0
         self.avg_customer_in_system = 0
 
-    def update(self, event):
-        time_since_last_event = event.event_time - self.time_last_event
-        self.time_last_event = event.event_time
-
-        for i in range(4):
-            num_of_customer_in_queue = 0
-            for j in range(len(self.queue[i])):
-                num_of_customer_in_queue += len(self.queue[i][j])
-                self.max_queue_length[i] = max(self.max_queue_length[i], len(self.queue[i][j]))
-            if len(self.queue[i]) > 0:
-                self.avg_queue_length[i] += round(num_of_customer_in_queue / len(self.queue[i]), 3) * time_since_last_event
-
-        self.avg_customer_in_system += time_since_last_event * self.num_of_customers_in_system
-        self.max_customer_in_the_system = max(self.max_customer_in_the_system, self.num_of_customers_in_system)
+    def enqueue(self, counter, cid, now):
+        # Joins the left-most shortest line at `counter`; only that line's
+        # length and time-weighted area change.
+        line = self.shortest[counter].shortest()
+        self.queue[counter][line].push(cid, now)
+        self.shortest[counter].update(line, len(self.queue[counter][line]))
+        return line
+
+    def dequeue(self, counter, line, now):
+        cid = self.queue[counter][line].pop(now)
+        self.shortest[counter].update(line, len(self.queue[counter][line]))
+        return cid
+
+    def served(self, counter, route, delay):
+        # A customer starts service at `counter`, after waiting `delay`.
+        self.queue_delay[counter].add(delay)
+        self.delay_sketch[counter].add(delay)
+        self.route_delay[route].add(delay)
 
     def finish(self, sim):
+        now = sim.now()
         for i in range(4):
-            self.max_queue_delay[i] = round(self.max_queue_delay[i] / 60, 3)
-            self.avg_queue_length[i] /= sim.now()
-            if self.total_customer_served_by_this_counter[i] > 0:
-                self.avg_queue_delay[i] = round(self.avg_queue_delay[i] / (60 * self.total_customer_served_by_this_counter[i]), 3)
+            delay = self.queue_delay[i]
+            self.total_customer_served_by_this_counter[i] = delay.count
+            self.max_queue_delay[i] = round(max(delay.max, 0.0) / 60, 3)
+            if len(self.queue[i]) > 0:
+                # Average number waiting per line at the counter.
+                self.avg_queue_length[i] = sum(line.time_average(now) for line in self.queue[i]) / len(self.queue[i])
+                self.max_queue_length[i] = max(line.max_length for line in self.queue[i])
+            if delay.count > 0:
+                self.avg_queue_delay[i] = round(delay.mean / 60, 3)
+                self.delay_quantiles[i] = [round(q / 60, 3) for q in self.delay_sketch[i].quantiles(QUANTILES).tolist()]
 
         for i in range(3):
+            delay = self.route_delay[i]
             if self.total_customer_served_by_this_route[i] > 0:
-                self.avg_route_delay[i] = round(self.avg_route_delay[i] / (60 * self.total_customer_served_by_this_route[i]), 3)
-            self.overall_avg_delay += (routes_probabilities[i] * self.avg_route_delay[i])
-            self.max_route_delay[i] = round(self.max_route_delay[i] / 60, 3)
+                self.avg_route_delay[i] = round(delay.sum / (60 * self.total_customer_served_by_this_route[i]), 3)
+            self.overall_avg_delay += (self.config.routes_probabilities[i] * self.avg_route_delay[i])
+            self.max_route_delay[i] = round(max(delay.max, 0.0) / 60, 3)
 
-        self.avg_customer_in_system = round(self.avg_customer_in_system / sim.now(), 3)
+        self.max_customer_in_the_system = int(self.customers_in_system.max)
+        self.avg_customer_in_system = round(self.customers_in_system.mean(now), 3)
 
     def report(self):
         print("Customer served by each counter  ", self.total_customer_served_by_this_counter)
         print("Average delays in queue: ", self.avg_queue_length)
         print("Max delays in the queue: ", self.max_queue_delay)
+        print("Delay in queue P50 / P95 / P99: ", self.delay_quantiles)
 
         print("Average queue length: ", self.avg_queue_length)
         print("Max queue length: ", self.max_queue_length)
@@ -98,201 +142,138 @@ class States:
         print("\n\n\n")
 
 
-class Event:
-    def __init__(self, sim):
-        self.eventType = None
-        self.sim = sim
-        self.event_time = None
-
-    def process(self):
-        raise Exception('Unimplemented process method for the event!')
-
-    def __repr__(self):
-        return self.eventType
-
-    def __lt__(self, other):
-        return True
+class Simulator:
+    def __init__(self, config, seed=None, event_list='heap'):
+        self.config = config
+        self.engine = Engine(event_list=event_list)
+        self.states = States(config, seed)
+        self.customers = CustomerTable(customer_columns)
+        self.stream = VariateStream(seed)
+        self.group_sizes = self.stream.discrete(config.group_size_table)
+        self.routes = self.stream.discrete(config.route_table)
+
+        self.engine.register(START, self.start)
+        self.engine.register(ARRIVAL, self.arrival)
+        self.engine.register(DEPARTURE, self.departure)
 
+    def initialize(self):
+        self.engine.clock = 0
+        self.engine.schedule(0, START)
 
-class StartEvent(Event):
-    def __init__(self, event_time, sim):
-        super().__init__(sim)
-        self.event_time = event_time
-        self.eventType = 'START'
-        self.sim = sim
+    def now(self):
+        return self.engine.clock
 
-    def process(self):
-        self.sim.states.total_num_of_group += 1
-        arrival_time = self.sim.now() + np.random.exponential(mu)
-        num_of_people_in_group = np.random.choice(group_size, p=group_size_probabilities)
+    def schedule_group(self):
+        self.states.total_num_of_group += 1
+        arrival_time = self.now() + self.stream.exponential(self.config.mu)
+        num_of_people_in_group = self.config.group_size[self.group_sizes.draw()]
 
         for i in range(num_of_people_in_group):
-            route_index = np.random.choice([0, 1, 2], p=routes_probabilities)
-            self.sim.states.total_customer_served_by_this_route[route_index] += 1
-            self.sim.schedule_event(ArrivalEvent(arrival_time, self.sim, self.sim.states.total_num_of_group, route_index, 0, 0))
-
-        self.sim.schedule_event(ExitEvent(total_sim_time, self.sim))
-
-
-class ExitEvent(Event):
-    def __init__(self, event_time, sim):
-        super().__init__(sim)
-        self.event_time = event_time
-        self.eventType = 'EXIT'
-        self.sim = sim
-
-    def process(self):
-        None
-
-
-class ArrivalEvent(Event):
-    def __init__(self, event_time, sim, group_no, route_idx, counter_idx, queue_idx):
-        super().__init__(sim)
-        self.event_time = event_time
-        self.eventType = 'ARRIVAL'
-        self.sim = sim
-        self.group_no = group_no
-        self.route_idx = route_idx
-        self.counter_idx = counter_idx
-        self.queue_idx = queue_idx
-
-    def process(self):
-        current_counter = routing[self.route_idx][self.counter_idx]
-
-        if self.counter_idx == 0:
-            self.sim.states.num_of_customers_in_system += 1
-
-        if self.counter_idx == 0 and self.group_no not in self.sim.states.is_new_group:
-            self.sim.states.is_new_group[self.group_no] = True
-            self.sim.states.total_num_of_group += 1
-            arrival_time = self.sim.now() + np.random.exponential(mu)
-            num_of_people_in_group = np.random.choice(group_size, p=group_size_probabilities)
-
-            for i in range(num_of_people_in_group):
-                route_index = np.random.choice([0, 1, 2], p=routes_probabilities)
-                self.sim.states.total_customer_served_by_this_route[route_index] += 1
-                self.sim.schedule_event(ArrivalEvent(arrival_time, self.sim, self.sim.states.total_num_of_group, route_index, 0, 0))
-
-        if self.sim.states.num_of_server[current_counter] == 0:
-            min_queue_length = np.inf
-            for i in range(len(self.sim.states.queue[current_counter])):
-                if len(self.sim.states.queue[current_counter][i]) < min_queue_length:
-                    min_queue_length = len(self.sim.states.queue[current_counter][i])
-                    self.queue_idx = i
-            self.sim.states.queue[current_counter][self.queue_idx].append(self)
+            route_index = self.routes.draw()
+            self.states.total_customer_served_by_this_route[route_index] += 1
+            cid = self.customers.add(arrival_time=arrival_time, route=route_index, stage=0, group=self.states.total_num_of_group, line=0)
+            self.engine.schedule(arrival_time, ARRIVAL, cid)
+
+    def service_time(self, current_counter, route_idx):
+        st = self.config.st
+        act = self.config.act
+        if current_counter != 3:
+            return self.stream.uniform(st[current_counter][0], st[current_counter][1])
+        service_time = 0
+        for i in self.config.routing[route_idx]:
+            service_time += self.stream.uniform(act[i][0], act[i][1])
+        return service_time
+
+    def start(self, data):
+        self.schedule_group()
+        self.engine.schedule(self.config.total_sim_time, EXIT)
+
+    def arrival(self, cid):
+        states = self.states
+        customers = self.customers
+        now = self.now()
+        route_idx = int(customers.route[cid])
+        counter_idx = int(customers.stage[cid])
+        current_counter = self.config.routing[route_idx][counter_idx]
+
+        if counter_idx == 0:
+            states.customers_in_system.add(1, now)
+
+            group_no = int(customers.group[cid])
+            if group_no not in states.is_new_group:
+                states.is_new_group[group_no] = True
+                self.schedule_group()
+
+        if states.num_of_server[current_counter] == 0:
+            customers.arrival_time[cid] = now
+            customers.line[cid] = states.enqueue(current_counter, cid, now)
         else:
             queue_idx = 0
-            service_time = 0
 
             if current_counter != 2:
-                self.sim.states.num_of_server[current_counter] -= 1
-
-            if current_counter != 3:
-                service_time = np.random.uniform(st[current_counter][0], st[current_counter][1])
-            else:
-                for i in routing[self.route_idx]:
-                    service_time += np.random.uniform(act[i][0], act[i][1])
-                queue_idx = self.sim.states.num_of_server[current_counter]
-
-            self.sim.states.total_customer_served_by_this_counter[current_counter] += 1
-            self.sim.schedule_event(DepartureEvent(self.event_time + service_time, self.sim, self.group_no, self.route_idx, self.counter_idx, queue_idx))
-
-
-class DepartureEvent(Event):
-    def __init__(self, event_time, sim, group_no, route_idx, counter_idx, queue_idx):
-        super().__init__(sim)
-        self.event_time = event_time
-        self.eventType = 'DEPARTURE'
-        self.sim = sim
-        self.group_no = group_no
-        self.route_idx = route_idx
-        self.counter_idx = counter_idx
-        self.queue_idx = queue_idx
-
-    def process(self):
-        current_counter = routing[self.route_idx][self.counter_idx]
-
-        if len(self.sim.states.queue[current_counter][self.queue_idx]) == 0:
-            self.sim.states.num_of_server[current_counter] += 1
+                states.num_of_server[current_counter] -= 1
+
+            service_time = self.service_time(current_counter, route_idx)
+            if current_counter == 3:
+                queue_idx = states.num_of_server[current_counter]
+
+            customers.line[cid] = queue_idx
+            states.served(current_counter, route_idx, 0.0)
+            self.engine.schedule(now + service_time, DEPARTURE, cid)
+
+    def departure(self, cid):
+        states = self.states
+        customers = self.customers
+        now = self.now()
+        route_idx = int(customers.route[cid])
+        counter_idx = int(customers.stage[cid])
+        queue_idx = int(customers.line[cid])
+        current_counter = self.config.routing[route_idx][counter_idx]
+
+        if not states.queue[current_counter][queue_idx]:
+            states.num_of_server[current_counter] += 1
         else:
-            service_time = 0
-
-            if current_counter != 3:
-                service_time = np.random.uniform(st[current_counter][0], st[current_counter][1])
-            else:
-                for i in routing[self.route_idx]:
-                    service_time += np.random.uniform(act[i][0], act[i][1])
-
-            front_event = self.sim.states.queue[current_counter][self.queue_idx].pop(0)
-            delay = self.event_time - front_event.event_time
+            front = states.dequeue(current_counter, queue_idx, now)
+            front_route_idx = int(customers.route[front])
+            service_time = self.service_time(current_counter, route_idx)
+            delay = now - float(customers.arrival_time[front])
 
-            self.sim.states.avg_route_delay[front_event.route_idx] += delay
-            self.sim.states.max_route_delay[front_event.route_idx] = max(self.sim.states.max_route_delay[front_event.route_idx], delay)
+            states.served(current_counter, front_route_idx, delay)
+            self.engine.schedule(now + service_time, DEPARTURE, front)
 
-            if current_counter != 2:
-                self.sim.states.avg_queue_delay[current_counter] += delay
-                self.sim.states.max_queue_delay[current_counter] = max(self.sim.states.max_queue_delay[current_counter], delay)
-
-            self.sim.states.total_customer_served_by_this_counter[current_counter] += 1
-            self.sim.schedule_event(DepartureEvent(self.event_time + service_time, self.sim, front_event.group_no, front_event.route_idx, front_event.counter_idx, front_event.queue_idx))
-
-        if self.counter_idx < len(routing[self.route_idx]) - 1:
-            self.sim.schedule_event(ArrivalEvent(self.event_time, self.sim, self.group_no, self.route_idx, self.counter_idx + 1, 0))
+        if counter_idx < len(self.config.routing[route_idx]) - 1:
+            customers.stage[cid] = counter_idx + 1
+            self.engine.schedule(now, ARRIVAL, cid)
         else:
-            self.sim.states.num_of_customers_in_system -= 1
-
-
-class Simulator:
-    def __init__(self):
-        self.eventQ = []
-        self.simulator_clock = 0
-        self.states = States()
-
-    def initialize(self):
-        self.simulator_clock = 0
-        self.schedule_event(StartEvent(0, self))
-
-    def now(self):
-        return self.simulator_clock
-
-    def schedule_event(self, event):
-        heapq.heappush(self.eventQ, (event.event_time, event))
+            states.customers_in_system.add(-1, now)
+            customers.remove(cid)
 
     def run(self):
         self.initialize()
-        while len(self.eventQ) > 0:
-            current_time, event = heapq.heappop(self.eventQ)
-            if event.eventType == 'EXIT':
-                break
-            if self.states is not None:
-                self.states.update(event)
-            self.simulator_clock = event.event_time
-            event.process()
+        self.engine.run()
         self.states.finish(self)
-        self.states.report()
 
 
-def init(idx):
-    global num_of_server, st, act
-    num_of_server = expansion_possibilities[idx]
-    temp_st = copy.deepcopy(st)
-    temp_act = copy.deepcopy(act)
+def simulate(config, seed):
+    sim = Simulator(config, seed)
+    sim.run()
+    return sim.states
 
-    for i in range(2):
-        for j in range(2):
-            st[i][j] = st[i][j] / num_of_server[i]
-            act[i][j] = act[i][j] / num_of_server[i]
 
-    st = copy.deepcopy(temp_st)
-    act = copy.deepcopy(temp_act)
+def run_scenarios(configs, seed, workers=None, cache=None):
+    # One run per configuration, all with the same seed (common random
+    # numbers), on a process pool. The returned States are in the order of
+    # `configs` whatever the number of workers.
+    model = simulate if cache is None else CachedModel(simulate, cache)
+    return run_tasks([(model, config, seed) for config in configs], workers)
 
 
 if __name__ == "__main__":
-    for i in range(8):
+    seed = 101
+    configs = [make_config(servers) for servers in expansion_possibilities]
+    # Scenarios already simulated with the same configuration and seed are
+    # read back from the cache instead of being run again.
+    for i, states in enumerate(run_scenarios(configs, seed, cache=ResultCache())):
         print("---------------RUN---------------", i)
         print("Expansion Posibilitis: ", expansion_possibilities[i])
-        init(i)
-        seed = 101
-        np.random.seed(seed)
-        sim = Simulator()
-        sim.run()
+        states.report()
@@ -1,272 +1,200 @@
-import heapq
-import math
+import sys
+
 import numpy as np
 
+from simkit.accumulators import Tally, TimeAverage
+from simkit.engine import Engine, EXIT, START, ARRIVAL, DEPARTURE
+from simkit.customers import CustomerTable
+from simkit.queues import FIFOQueue
+from simkit.replication import run_replications, run_until_precision
+from simkit.sketches import KLLSketch, QUANTILES
+from simkit.specs import load_specs
+from simkit.variates import VariateStream
+
 sim_time = 8
 sim_length = 1
 
-num_of_stations = 0
-num_of_machines_in_each_station = []
-mu = 0.0
-num_of_job_types = 0
-job_probabilities = []
-num_of_stations_for_each_job = []
-routing_for_each_job = []
-mean_service_time_for_each_job = []
+job_columns = (('arrival_time', np.float64), ('route', np.int32), ('stage', np.int32), ('delay', np.float64))
+
 
 class States:
-    def __init__(self):
+    def __init__(self, spec, seed=None):
+        self.spec = spec
         self.queue = []
-        self.avg_queue_delay = []
-        self.area_in_queue = []
+        self.queue_delay = []
         self.avg_queue_delay = []
         self.avg_num_in_queue = []
         self.total_customer_served_by_each_station = []
 
-        for i in range(num_of_stations):
-            self.queue.append([])
+        for i in range(spec.num_of_stations):
+            self.queue.append(FIFOQueue())
+            self.queue_delay.append(Tally())
             self.avg_queue_delay.append(0)
             self.total_customer_served_by_each_station.append(0)
-            self.area_in_queue.append(0)
-            self.avg_queue_delay.append(0)
             self.avg_num_in_queue.append(0)
 
-        self.num_of_jobs_in_the_system = 0
-        self.num_of_server = num_of_machines_in_each_station
+        self.jobs_in_system = TimeAverage()
+        self.num_of_server = spec.num_of_machines_in_each_station.tolist()
 
         self.job_cnt = []
+        self.job_delay = []
+        self.job_delay_sketch = []
         self.avg_job_delay = []
-        for i in range(num_of_job_types):
+        for i in range(spec.num_of_job_types):
             self.job_cnt.append(0)
+            self.job_delay.append(Tally())
+            self.job_delay_sketch.append(KLLSketch(seed=seed))
             self.avg_job_delay.append(0)
 
-        self.area_number_job = 0
-        self.time_since_last_event = 0.0
         self.overall_avg_delay = 0.0
         self.avg_number_of_jobs = 0
 
-    def update(self, event):
-        time_since_last_event = event.event_time - self.time_since_last_event
-        self.time_since_last_event = event.event_time
-
-        self.avg_number_of_jobs += self.num_of_jobs_in_the_system * time_since_last_event
-
-        for i in range(num_of_stations):
-            self.area_in_queue[i] += len(self.queue[i]) * time_since_last_event
-
     def finish(self, sim):
         self.overall_avg_delay = 0
 
-        for i in range(num_of_stations):
+        for i in range(self.spec.num_of_stations):
             if self.total_customer_served_by_each_station[i] != 0:
-                self.avg_queue_delay[i] /= self.total_customer_served_by_each_station[i]
-            self.avg_num_in_queue[i] = self.area_in_queue[i] / sim.now()
+                self.avg_queue_delay[i] = self.queue_delay[i].sum / self.total_customer_served_by_each_station[i]
+            self.avg_num_in_queue[i] = self.queue[i].time_average(sim.now())
 
-        for i in range(num_of_job_types):
+        for i in range(self.spec.num_of_job_types):
             if self.job_cnt[i] != 0:
-                self.avg_job_delay[i] /= self.job_cnt[i]
-                self.overall_avg_delay += job_probabilities[i] * self.avg_job_delay[i]
+                self.avg_job_delay[i] = self.job_delay[i].sum / self.job_cnt[i]
+                self.overall_avg_delay += self.spec.job_probabilities[i] * self.avg_job_delay[i]
 
-        self.avg_number_of_jobs /= sim.now()
+        self.avg_number_of_jobs = self.jobs_in_system.mean(sim.now())
 
     def report(self, sim):
         None
 
-class Event:
-    def __init__(self, sim):
-        self.eventType = None
-        self.sim = sim
-        self.event_time = None
-
-    def process(self, sim):
-        raise Exception('Unimplemented process method for the event!')
-
-    def __repr__(self):
-        return self.eventType
-
-
-class StartEvent(Event):
-    def __init__(self, event_time, sim):
-        super().__init__(sim)
-        self.event_time = event_time
-        self.eventType = 'START'
-        self.sim = sim
-
-    def process(self, sim):
-        arrival_time = self.event_time + np.random.exponential(mu)
-        job_type = np.random.choice(list(range(0, num_of_job_types)), p=job_probabilities)
-        self.sim.schedule_event(ArrivalEvent(arrival_time, self.sim, job_type, 0))
-        self.sim.schedule_event(ExitEvent(sim_time * sim_length, self.sim))
-
-
-class ExitEvent(Event):
-    def __init__(self, event_time, sim):
-        super().__init__(sim)
-        self.event_time = event_time
-        self.eventType = 'EXIT'
-        self.sim = sim
-
-    def process(self, sim):
-        None
-
-
-class ArrivalEvent(Event):
-    def __init__(self, event_time, sim, job_type, station_idx):
-        super().__init__(sim)
-        self.event_time = event_time
-        self.eventType = 'ARRIVAL'
-        self.sim = sim
-        self.job_type = job_type
-        self.station_idx = station_idx
+class Simulator:
+    def __init__(self, spec, seed=None, event_list='heap'):
+        self.spec = spec
+        self.engine = Engine(event_list=event_list)
+        self.states = States(spec, seed)
+        self.jobs = CustomerTable(job_columns)
+        self.stream = VariateStream(seed)
+        self.job_types = self.stream.discrete(spec.job_type_table)
+        # Plain-list views of the spec's tables: the event handlers look up one
+        # entry at a time, which is cheaper on lists than on NumPy arrays.
+        self.routing = spec.routing.tolist()
+        self.service_mean = spec.mean_service_time.tolist()
+        self.last_stage = (spec.num_of_stations_for_each_job - 1).tolist()
+
+        self.engine.register(START, self.start)
+        self.engine.register(ARRIVAL, self.arrival)
+        self.engine.register(DEPARTURE, self.departure)
 
-    def process(self, sim):
-        current_station = routing_for_each_job[self.job_type][self.station_idx]
+    def initialize(self):
+        self.engine.clock = 0
+        self.engine.schedule(0, START)
 
-        if sim.states.num_of_server[current_station] > 0:
-            sim.states.num_of_server[current_station] -= 1
-            mean_time = mean_service_time_for_each_job[self.job_type][self.station_idx]
-            erlang = 2 * np.random.exponential(mean_time / 2)
-            sim.schedule_event(DepartureEvent(self.sim.now() + erlang, self.sim, self.job_type, self.station_idx))
+    def now(self):
+        return self.engine.clock
+
+    def schedule_job(self):
+        arrival_time = self.now() + self.stream.exponential(self.spec.mu)
+        job_type = self.job_types.draw()
+        jid = self.jobs.add(arrival_time=arrival_time, route=job_type, stage=0, delay=0.0)
+        self.engine.schedule(arrival_time, ARRIVAL, jid)
+
+    def start(self, data):
+        self.schedule_job()
+        self.engine.schedule(sim_time * sim_length, EXIT)
+
+    def arrival(self, jid):
+        states = self.states
+        jobs = self.jobs
+        now = self.now()
+        job_type = int(jobs.route[jid])
+        station_idx = int(jobs.stage[jid])
+        current_station = self.routing[job_type][station_idx]
+
+        if states.num_of_server[current_station] > 0:
+            states.num_of_server[current_station] -= 1
+            erlang = 2 * self.stream.exponential(self.service_mean[job_type][station_idx] / 2)
+            self.engine.schedule(now + erlang, DEPARTURE, jid)
         else:
-            sim.states.queue[current_station].append(self)
-
-        if self.station_idx == 0:
-            self.sim.states.num_of_jobs_in_the_system += 1
-            self.sim.states.job_cnt[self.job_type] += 1
-            arrival_time = self.event_time + np.random.exponential(mu)
-            job_type = np.random.choice(list(range(0, num_of_job_types)), p=job_probabilities)
-            self.sim.schedule_event(ArrivalEvent(arrival_time, self.sim, job_type, 0))
-
-
-class DepartureEvent(Event):
-    def __init__(self, event_time, sim, job_type, station_idx):
-        super().__init__(sim)
-        self.event_time = event_time
-        self.eventType = 'DEPARTURE'
-        self.sim = sim
-        self.job_type = job_type
-        self.station_idx = station_idx
-
-    def process(self, sim):
-        current_station = routing_for_each_job[self.job_type][self.station_idx]
-
-        if len(self.sim.states.queue[current_station]) > 0:
-            front_event = self.sim.states.queue[current_station].pop(0)
-            delay = self.sim.now() - front_event.event_time
-
-            self.sim.states.avg_queue_delay[current_station] += delay
-            self.sim.states.avg_job_delay[front_event.job_type] += delay
-
-            mean_time = mean_service_time_for_each_job[front_event.job_type][front_event.station_idx]
-            erlang = 2 * np.random.exponential(mean_time / 2)
-            sim.schedule_event(DepartureEvent(self.sim.now() + erlang, self.sim, front_event.job_type, front_event.station_idx))
+            jobs.arrival_time[jid] = now
+            states.queue[current_station].push(jid, now)
+
+        if station_idx == 0:
+            states.jobs_in_system.add(1, now)
+            states.job_cnt[job_type] += 1
+            self.schedule_job()
+
+    def departure(self, jid):
+        states = self.states
+        jobs = self.jobs
+        now = self.now()
+        job_type = int(jobs.route[jid])
+        station_idx = int(jobs.stage[jid])
+        current_station = self.routing[job_type][station_idx]
+
+        if states.queue[current_station]:
+            front = states.queue[current_station].pop(now)
+            front_job_type = int(jobs.route[front])
+            delay = now - float(jobs.arrival_time[front])
+
+            states.queue_delay[current_station].add(delay)
+            states.job_delay[front_job_type].add(delay)
+            jobs.delay[front] += delay
+
+            erlang = 2 * self.stream.exponential(self.service_mean[front_job_type][int(jobs.stage[front])] / 2)
+            self.engine.schedule(now + erlang, DEPARTURE, front)
         else:
-            self.sim.states.num_of_server[current_station] += 1
+            states.num_of_server[current_station] += 1
 
-        self.sim.states.total_customer_served_by_each_station[current_station] += 1
+        states.total_customer_served_by_each_station[current_station] += 1
 
-        if self.station_idx < num_of_stations_for_each_job[self.job_type] - 1:
-            self.sim.schedule_event(ArrivalEvent(self.sim.now(), self.sim, self.job_type, self.station_idx + 1))
+        if station_idx < self.last_stage[job_type]:
+            jobs.stage[jid] = station_idx + 1
+            self.engine.schedule(now, ARRIVAL, jid)
         else:
-            self.sim.states.current_jobs_in_system -= 1
-
-
-class Simulator:
-    def __init__(self):
-        self.eventQ = []
-        self.simulator_clock = 0
-        self.states = States()
-
-    def initialize(self):
-        self.simulator_clock = 0
-        self.schedule_event(StartEvent(0, self))
-
-    def now(self):
-        return self.simulator_clock
-
-    def schedule_event(self, event):
-        heapq.heappush(self.eventQ, (event.event_time, event))
+            states.jobs_in_system.add(-1, now)
+            states.job_delay_sketch[job_type].add(float(jobs.delay[jid]))
+            jobs.remove(jid)
 
     def run(self):
         self.initialize()
-
-        while len(self.eventQ) > 0:
-            time, event = heapq.heappop(self.eventQ)
-            if event.eventType == 'EXIT':
-                break
-
-            if self.states is not None:
-                self.states.update(event)
-
-            self.simulator_clock = event.event_time
-            event.process(self)
-
+        self.engine.run()
         return self.states.finish(self)
 
 
-def read_input():
-    global num_of_stations, num_of_machines_in_each_station, mu, num_of_job_types, job_probabilities
-    global num_of_stations_for_each_job, routing_for_each_job, mean_service_time_for_each_job
-
-    file = open("input.txt", "r")
-    line = file.readline()
-    num_of_stations = int(line[0])
-
-    line = file.readline().split()
-    for i in range(len(line)):
-        num_of_machines_in_each_station.append(int(line[i]))
-
-    line = file.readline().split()
-    mu = float(line[0])
-
-    line = file.readline().split()
-    num_of_job_types = int(line[0])
-
-    line = file.readline().split()
-    for i in range(len(line)):
-        job_probabilities.append(float(line[i]))
-
-    line = file.readline().split()
-    for i in range(len(line)):
-        num_of_stations_for_each_job.append(int(line[i]))
-
-    for i in range(num_of_job_types):
-        line = file.readline().split()
-        routing = []
-        for j in range(len(line)):
-            routing.append(int(line[j]))
-        routing_for_each_job.append(routing)
-        line = file.readline().split()
-        mean_service_time = []
-        for j in range(len(line)):
-            mean_service_time.append(float(line[j]))
-        mean_service_time_for_each_job.append(mean_service_time)
+def replicate(spec, seed):
+    sim = Simulator(spec, seed)
+    sim.run()
+    return {
+        'avg_queue_delay': sim.states.avg_queue_delay,
+        'avg_job_delay': sim.states.avg_job_delay,
+        'avg_num_in_queue': sim.states.avg_num_in_queue,
+        'overall_avg_delay': sim.states.overall_avg_delay,
+        'avg_number_of_jobs': sim.states.avg_number_of_jobs,
+        'job_delay_sketch': sim.states.job_delay_sketch,
+    }
 
 
 if __name__ == "__main__":
-    read_input()
-
-    avg_job_delay = None
-    avg_num_in_queue = None
-    overall_avg_delay = None
-    avg_num_of_jobs = None
-    avg_queue_delay = None
-
-    for i in range(30):
-        sim = Simulator()
-        sim.run()
-
-        for j in range(num_of_job_types):
-            avg_job_delay[j] += (sim.states.avg_job_delay[j] / 30)
-
-        for j in range(num_of_stations):
-            avg_queue_delay[j] += (sim.states.avg_queue_delay[j] / 30)
-            avg_num_in_queue[j] += (sim.states.avg_num_in_queue[j] / 30)
-
-        overall_avg_delay += (sim.states.overall_avg_delay / 30)
-        avg_num_of_jobs += (sim.states.avg_number_of_jobs / 30)
-
-    print("Average queue delay for each job: ", avg_queue_delay)
-    print("Average total delay in each job: ", avg_job_delay)
-    print("Average number of jobs: ", avg_num_of_jobs)
-    print("Overall average delay: ", overall_avg_delay)
+    # Model specs to simulate side by side: text, .json or .toml files.
+    specs = load_specs(sys.argv[1:] or ["input.txt"])
+
+    seed = 101
+    # Relative CI half-width to reach on each job type's delay before stopping;
+    # set to None to run a fixed number of replications instead.
+    precision = 0.1
+    if precision is None:
+        summaries = run_replications(replicate, specs, 30, seed)
+    else:
+        summaries = run_until_precision(replicate, specs, seed, relative={'avg_job_delay': precision}, min_replications=10)
+
+    for spec, summary in zip(specs, summaries):
+        if len(specs) > 1:
+            print(spec.source)
+        print("Replications: ", summary['overall_avg_delay'].n)
+
+        print("Average queue delay for each job: ", summary['avg_queue_delay'].mean.tolist())
+        print("Average total delay in each job: ", summary['avg_job_delay'].mean.tolist())
+        print("Average number of jobs: ", summary['avg_number_of_jobs'].mean)
+        print("Overall average delay: ", summary['overall_avg_delay'].mean)
+        print("95% CI half-width of overall average delay: ", summary['overall_avg_delay'].half_width)
+        print("Total delay P50 / P95 / P99 for each job: ", [sketch.quantiles(QUANTILES).tolist() for sketch in summary['job_delay_sketch']])
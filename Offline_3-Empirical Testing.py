@@ -1,16 +1,65 @@
 import numpy as np
 import math as math
-from scipy import stats
+from scipy import fft, stats
+
+from simkit.lcg import LCG
+
+# Serial tests count cells in a dense array up to this many cells and only
+# the occupied cells (np.unique) beyond it. Tuples and values are processed
+# in chunks of CHUNK so the temporaries stay small however long the sequence.
+DENSE_CELLS = 2 ** 24
+CHUNK = 2 ** 20
+
+
+class RunsUpCounter:
+    # Lengths of runs up (a run continues while values do not decrease) in a
+    # sequence fed chunk by chunk; runs of 6 and longer share the last count.
+    # Only the run still open at the end of a chunk is carried over.
+    def __init__(self):
+        self.counts = np.zeros(6, dtype=np.int64)
+        self.n = 0
+        self.last = None
+        self.current = 0
+
+    def add(self, chunk):
+        chunk = np.asarray(chunk)
+        if len(chunk) == 0:
+            return
+        starts = np.flatnonzero(chunk[1:] < chunk[:-1]) + 1
+        if self.last is None or chunk[0] < self.last:
+            starts = np.concatenate(([0], starts))
+        if len(starts):
+            lengths = np.diff(starts)
+            if self.current:
+                lengths = np.concatenate(([self.current + starts[0]], lengths))
+            self.tally(lengths)
+            self.current = len(chunk) - starts[-1]
+        else:
+            self.current += len(chunk)
+        self.last = chunk[-1]
+        self.n += len(chunk)
+
+    def tally(self, lengths):
+        self.counts += np.bincount(np.minimum(lengths, 6) - 1, minlength=6)
+
+    def finish(self):
+        # Counts including the run open at the end of the sequence.
+        counts = self.counts.copy()
+        if self.current:
+            counts[min(6, self.current) - 1] += 1
+        return counts
 
 
 class RandomNumberTester:
-    def __init__(self, seed, n, alpha):
+    def __init__(self, seed, n, alpha, generator=None):
         self.seed = seed
         self.n = n
+        # Testers for several sample sizes can share one generator, which
+        # then only produces the longest sequence once.
+        self.generator = generator if generator is not None else LCG(seed)
         self.z = []
         self.u = []
         self.alpha = alpha
-        self.mapping = {}
         self.a = [[4529.4, 9044.9, 13568, 18091, 22615, 27892],
                   [9044.9, 18097, 27139, 36187, 45234, 55789],
                   [13568, 27139, 40721, 54281, 67852, 83685],
@@ -20,12 +69,8 @@ class RandomNumberTester:
         self.b = [1 / 6, 5 / 24, 11 / 120, 19 / 720, 29 / 5040, 1 / 840]
 
     def generate_random_number(self):
-        for i in range(self.n):
-            if i == 0:
-                self.z.append(self.seed)
-            else:
-                self.z.append(int(65539 * self.z[i - 1]) % 2 ** 31)
-            self.u.append(self.z[i] / 2 ** 31)
+        self.z = self.generator.prefix(self.n)
+        self.u = self.z / self.generator.m
 
     def uniformity_test(self, k):
         f = []
@@ -42,50 +87,76 @@ class RandomNumberTester:
         else:
             print("Chi2 =", chi2, "ppf =", stats.chi2.ppf(q=1 - self.alpha, df=k - 1), "Not rejected")
 
-    def generate_all_sequence(self, d, k, pattern):
-        if d:
-            for i in range(k):
-                self.generate_all_sequence(d - 1, k, pattern + str(i))
-        else:
-            self.mapping[pattern] = 0
+    def tuple_codes(self, d, k, positions):
+        # Base-k code of the d-tuple of cells starting at each position,
+        # wrapping around the end of the sequence.
+        u = np.asarray(self.u)
+        codes = np.zeros(len(positions), dtype=np.int64)
+        for t in range(d):
+            cells = (u[(positions + t) % self.n] * k).astype(np.int64)
+            codes = codes * k + cells
+        return codes
+
+    def cell_counts(self, d, k, stop, step):
+        # Counts of the occupied cells among the d-tuples starting at
+        # 0, step, 2 * step, ... < stop.
+        num_cells = k ** d
+        dense = num_cells <= DENSE_CELLS
+        counts = np.zeros(num_cells, dtype=np.int64) if dense else []
+        for start in range(0, stop, CHUNK * step):
+            positions = np.arange(start, min(stop, start + CHUNK * step), step)
+            codes = self.tuple_codes(d, k, positions)
+            if dense:
+                counts += np.bincount(codes, minlength=num_cells)
+            else:
+                counts.append(np.unique(codes, return_counts=True))
+        if dense:
+            return counts
+        codes, inverse = np.unique(np.concatenate([c for c, _ in counts]), return_inverse=True)
+        return np.bincount(inverse, weights=np.concatenate([n for _, n in counts])).astype(np.int64)
+
+    def chi2_statistic(self, counts, num_cells, total):
+        # Pearson statistic over num_cells equiprobable cells, of which only
+        # the occupied ones need be listed in counts.
+        expected = total / num_cells
+        summation = ((counts - expected) ** 2).sum() + (num_cells - len(counts)) * expected ** 2
+        return float(summation * (num_cells / total))
 
     def serial_test(self, d, k):
-        summation = 0
-        self.mapping = {}
-        self.generate_all_sequence(d, k, "")
-        for i in range(math.floor(self.n / d)):
-            pattern = ""
-            for j in range(i * d, (i * d) + d):
-                pattern += str(int(self.u[j] * k))
-            self.mapping[pattern] += 1
         l = math.floor(self.n / d)
-        for key in self.mapping:
-            summation += (self.mapping[key] - (l / k ** d)) ** 2
-        chi2 = summation * (k ** d / l)
+        chi2 = self.chi2_statistic(self.cell_counts(d, k, l * d, d), k ** d, l)
         if chi2 > stats.chi2.ppf(q=1 - self.alpha, df=pow(k, d) - 1):
             print("Chi2 =", chi2, "ppf =", stats.chi2.ppf(q=1 - self.alpha, df=pow(k, d) - 1), "Rejected")
         else:
             print("Chi2 =", chi2, "ppf =", stats.chi2.ppf(q=1 - self.alpha, df=pow(k, d) - 1), "Not rejected")
 
-    def runs_test(self):
-        r = []
-        cur_length = 1
-        summation = 0
-        for i in range(6):
-            r.append(0)
-        for i in range(1, self.n):
-            if self.u[i] >= self.u[i - 1]:
-                cur_length += 1
-            else:
-                r[min(5, cur_length - 1)] += 1
-                cur_length = 1
-            if i == self.n - 1:
-                r[min(5, cur_length - 1)] += 1
-        print(r)
-        for i in range(6):
-            for j in range(6):
-                summation += self.a[i][j] * (r[i] - self.n * self.b[i]) * (r[j] - self.n * self.b[j])
-        R = (1.0 / self.n) * summation
+    def overlapping_serial_test(self, d, k):
+        # All n overlapping (cyclic) d-tuples. Their counts are dependent, so
+        # the statistic is the difference psi2(d) - psi2(d - 1), which is
+        # asymptotically chi-square with k^d - k^(d-1) degrees of freedom.
+        psi2 = [0.0]
+        for m in range(max(1, d - 1), d + 1):
+            psi2.append(self.chi2_statistic(self.cell_counts(m, k, self.n, 1), k ** m, self.n))
+        delta = psi2[-1] - psi2[-2]
+        df = pow(k, d) - pow(k, d - 1)
+        if delta > stats.chi2.ppf(q=1 - self.alpha, df=df):
+            print("Delta psi2 =", delta, "ppf =", stats.chi2.ppf(q=1 - self.alpha, df=df), "Rejected")
+        else:
+            print("Delta psi2 =", delta, "ppf =", stats.chi2.ppf(q=1 - self.alpha, df=df), "Not rejected")
+
+    def runs_test(self, chunks=None):
+        # `chunks` streams the sequence in pieces, e.g. LCG.blocks(), so that
+        # it never has to be held in memory; by default it is self.u.
+        if chunks is None:
+            chunks = (self.u[i:i + CHUNK] for i in range(0, self.n, CHUNK))
+        counter = RunsUpCounter()
+        for chunk in chunks:
+            counter.add(chunk)
+        r = counter.finish()
+        n = counter.n
+        print(r.tolist())
+        deviation = r - n * np.array(self.b)
+        R = (1.0 / n) * (deviation @ np.array(self.a) @ deviation)
         if R > stats.chi2.ppf(q=1 - self.alpha, df=6):
             print("R =", R, "ppf =", stats.chi2.ppf(q=1 - self.alpha, df=6), "Rejected")
         else:
@@ -104,12 +175,48 @@ class RandomNumberTester:
         else:
             print("A =", abs(A), "ppf =", stats.norm.ppf(q=1 - self.alpha / 2), "Not rejected")
 
+    def autocorrelation_test(self, max_lag, method='holm'):
+        # Lag-j test for every j = 1..max_lag over all m = n - j products
+        # u[i] * u[i + j], which one FFT gives for all lags at once. Under
+        # independence rho_j = 12 / m * sum - 3 has variance (13m - 6j) / m^2
+        # (7 / m once m <= j). The max_lag tests are judged together, with
+        # Holm's step-down or Bonferroni's correction, at family level alpha.
+        if method not in ('holm', 'bonferroni'):
+            raise ValueError('Unknown correction: %s' % method)
+        if not 1 <= max_lag < self.n:
+            raise ValueError('Lags must be in 1..%d: %s' % (self.n - 1, max_lag))
+        u = np.asarray(self.u, dtype=np.float64)
+        size = fft.next_fast_len(2 * self.n, real=True)
+        spectrum = fft.rfft(u, size)
+        products = fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, size)[1:max_lag + 1]
+
+        j = np.arange(1, max_lag + 1)
+        m = self.n - j
+        rho = (12 / m) * products - 3
+        variance = np.where(m > j, (13 * m - 6 * j) / m ** 2, 7 / m)
+        A = rho / np.sqrt(variance)
+
+        p = 2 * stats.norm.sf(np.abs(A))
+        if method == 'holm':
+            order = np.argsort(p)
+            passed = p[order] > self.alpha / (max_lag - np.arange(max_lag))
+            rejections = np.argmax(passed) if passed.any() else max_lag
+            rejected = np.sort(j[order[:rejections]])
+        else:
+            rejected = j[p <= self.alpha / max_lag]
+
+        worst = int(np.argmax(np.abs(A)))
+        print("max |A| =", abs(A[worst]), "at j =", worst + 1, "ppf =", stats.norm.ppf(q=1 - self.alpha / (2 * max_lag)),
+              "Rejected at j = " + str(rejected.tolist()) if len(rejected) else "Not rejected")
+        return A, rejected
+
 
 if __name__ == "__main__":
+    generator = LCG(1505100)
     for n in [20, 500, 4000, 10000]:
         print("N=", n, "\n")
 
-        rndtest = RandomNumberTester(1505100, n, 0.1)
+        rndtest = RandomNumberTester(1505100, n, 0.1, generator)
         rndtest.generate_random_number()
 
         print("Uniformity Testing")
@@ -125,6 +232,13 @@ if __name__ == "__main__":
                 rndtest.serial_test(d, k)
         print("\n")
 
+        print("Overlapping Serial Testing")
+        for d in [2, 3]:
+            for k in [4, 8]:
+                print("d=", d, "k=", k)
+                rndtest.overlapping_serial_test(d, k)
+        print("\n")
+
         print("Runs test")
         rndtest.runs_test()
         print("\n")
@@ -134,3 +248,9 @@ if __name__ == "__main__":
             print("j=", j)
             rndtest.correlation_test(j)
         print("\n")
+
+        print("Autocorrelation Testing")
+        max_lag = min(50, n // 4)
+        print("lags 1 ..", max_lag)
+        rndtest.autocorrelation_test(max_lag)
+        print("\n")
@@ -0,0 +1,32 @@
+"""
+Shared building blocks for the queueing models in this repository.
+"""
+
+from simkit.accumulators import Tally, TimeAverage, Counter
+from simkit.analytical import erlang_c, mmk
+from simkit.cache import ResultCache, CachedModel
+from simkit.customers import CustomerTable
+from simkit.engine import Engine, EXIT, START, ARRIVAL, DEPARTURE
+from simkit.eventlist import HeapEventList, CalendarEventList, make_event_list
+from simkit.indexes import ShortestQueueIndex
+from simkit.lcg import LCG
+from simkit.output_analysis import BatchMeansAnalyzer, SteadyStateResult
+from simkit.plotting import render
+from simkit.queues import FIFOQueue, LIFOQueue, PriorityQueue, make_queue
+from simkit.recursions import lindley, kiefer_wolfowitz, queue_summary
+from simkit.replication import Summary, run_replications, run_until_precision
+from simkit.results import ResultStore, flatten, summary_row
+from simkit.servers import IdleServerPool
+from simkit.sketches import KLLSketch, QUANTILES
+from simkit.specs import JobShopSpec, load_spec, load_specs
+from simkit.variates import VariateStream, DiscreteStream, AliasTable, spawn_streams
+
+__all__ = ['Tally', 'TimeAverage', 'Counter', 'CustomerTable', 'Engine', 'EXIT', 'START', 'ARRIVAL', 'DEPARTURE',
+           'HeapEventList', 'CalendarEventList', 'make_event_list',
+           'BatchMeansAnalyzer', 'SteadyStateResult',
+           'FIFOQueue', 'LIFOQueue', 'PriorityQueue', 'make_queue', 'ShortestQueueIndex', 'IdleServerPool',
+           'lindley', 'kiefer_wolfowitz', 'queue_summary', 'erlang_c', 'mmk',
+           'Summary', 'run_replications', 'run_until_precision',
+           'ResultStore', 'flatten', 'summary_row', 'render', 'ResultCache', 'CachedModel',
+           'KLLSketch', 'QUANTILES', 'JobShopSpec', 'load_spec', 'load_specs',
+           'VariateStream', 'DiscreteStream', 'AliasTable', 'spawn_streams', 'LCG']
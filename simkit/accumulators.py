@@ -0,0 +1,131 @@
+"""
+Constant-memory streaming statistics.
+
+Tally summarises observations (Welford mean/variance, min, max), TimeAverage
+summarises a piecewise-constant level over time (time-weighted mean, min,
+max) and Counter counts events. All of them can be merged, so accumulators
+from replications run in other processes can be combined without ever
+keeping the samples.
+"""
+
+import math
+
+import numpy as np
+
+
+class Tally:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        batch = Tally()
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other):
+        # Chan et al. pairwise update of count, mean and sum of squares.
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def sum(self):
+        return self.mean * self.count
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def __repr__(self):
+        return 'Tally(count=%d, mean=%s, variance=%s)' % (self.count, self.mean, self.variance)
+
+
+class TimeAverage:
+    def __init__(self, value=0.0, start=0.0):
+        self.value = value
+        self.start = start
+        self.last_time = start
+        self.area = 0.0
+        self.min = value
+        self.max = value
+
+    def advance(self, now):
+        self.area += self.value * (now - self.last_time)
+        self.last_time = now
+
+    def update(self, value, now):
+        # The level changes to `value` at time `now`.
+        self.area += self.value * (now - self.last_time)
+        self.last_time = now
+        self.value = value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def add(self, delta, now):
+        self.update(self.value + delta, now)
+
+    def mean(self, now=None):
+        if now is None:
+            now = self.last_time
+        duration = now - self.start
+        if duration <= 0:
+            return 0.0
+        return (self.area + self.value * (now - self.last_time)) / duration
+
+    def merge(self, other):
+        # Pools two observation windows, e.g. the same level in two
+        # replications: areas and observed durations (each up to its
+        # last_time) add up.
+        self.area += other.area
+        self.start -= other.last_time - other.start
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def __repr__(self):
+        return 'TimeAverage(mean=%s, max=%s)' % (self.mean(), self.max)
+
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    def increment(self, amount=1):
+        self.count += amount
+
+    def merge(self, other):
+        self.count += other.count
+        return self
+
+    def __repr__(self):
+        return 'Counter(%d)' % self.count
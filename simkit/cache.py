@@ -0,0 +1,169 @@
+"""
+Persistent memoization of simulation results.
+
+A ResultCache is a directory of pickled results, one file per key. The key is
+the SHA-256 of a canonical description of everything the result depends on:
+the model (module, qualified name, defining file and a hash of that file's
+source, so editing a model script invalidates its entries), its parameter
+point or configuration, the seed (a SeedSequence is described by its entropy
+and spawn key, so every replication gets its own entry), the run length and
+any other context the caller passes, plus ENGINE_VERSION. Bump ENGINE_VERSION
+whenever a change to simkit itself alters results, which invalidates every
+stored entry at once.
+
+Writes go to a temporary file in the cache directory and are moved into place
+with os.replace, so concurrent workers never see a partial entry and the last
+writer of an identical result simply wins. Reads bump the file's mtime. Each
+cache object keeps a running total of the directory's size (scanned once, on
+its first write), and only when that goes past max_bytes is the directory
+rescanned and the least recently used entries deleted until it fits again.
+An entry that vanishes is a miss; one that cannot be unpickled, e.g. because
+it refers to a class that has since been renamed, is deleted and is a miss.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+ENGINE_VERSION = 3
+
+MISSING = object()
+
+source_hashes = {}
+
+
+def source_hash(filename):
+    # SHA-256 of a model's source file, read once per process.
+    if filename not in source_hashes:
+        try:
+            with open(filename, 'rb') as file:
+                source_hashes[filename] = hashlib.sha256(file.read()).hexdigest()
+        except OSError:
+            source_hashes[filename] = ''
+    return source_hashes[filename]
+
+
+def canonical(value):
+    # Stable text for hashing: unlike pickle or repr() it does not depend on
+    # object identity, dict order or memory addresses.
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return repr(value)
+    if isinstance(value, np.generic):
+        return repr(value.item())
+    if isinstance(value, np.ndarray):
+        digest = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+        return 'array(%s, %s, %s)' % (value.dtype.str, value.shape, digest)
+    if isinstance(value, np.random.SeedSequence):
+        return 'SeedSequence(%r, %r, %r)' % (value.entropy, value.spawn_key, value.pool_size)
+    if isinstance(value, (list, tuple)):
+        return '%s(%s)' % (type(value).__name__, ', '.join(canonical(item) for item in value))
+    if isinstance(value, dict):
+        return 'dict(%s)' % ', '.join(sorted('%s: %s' % (canonical(k), canonical(v)) for k, v in value.items()))
+    if callable(value) and hasattr(value, '__qualname__'):
+        code = getattr(value, '__code__', None)
+        if code is None:
+            return '%s.%s' % (value.__module__, value.__qualname__)
+        filename = code.co_filename
+        return '%s.%s@%s#%s' % (value.__module__, value.__qualname__, os.path.basename(filename), source_hash(filename))
+    if hasattr(value, '__dict__'):
+        return '%s%s' % (type(value).__qualname__, canonical(vars(value)))
+    raise TypeError('cannot derive a cache key from %r' % (value,))
+
+
+class ResultCache:
+    def __init__(self, directory='.simcache', max_bytes=256 * 2 ** 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total = None  # bytes in the directory, as far as this process knows
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, *parts):
+        text = canonical((ENGINE_VERSION,) + parts)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key, default=MISSING):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+            os.utime(path)
+        except OSError:
+            return default
+        except Exception:
+            self.discard(path)
+            return default
+        return value
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def put(self, key, value):
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+                size = file.tell()
+            os.replace(temp, self.path(key))
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        if self.total is None:
+            self.total = sum(size for _, size, _ in self.entries())
+        else:
+            self.total += size
+        if self.total > self.max_bytes:
+            self.evict()
+
+    def lookup(self, compute, *parts):
+        # Returns the cached result for `parts`, computing and storing it on a miss.
+        key = self.key(*parts)
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.discard(os.path.join(self.directory, name))
+            total -= size
+        self.total = total
+
+
+class CachedModel:
+    # Wraps a replication model(point, seed) so each (point, seed) is looked
+    # up in `cache` first; `context` names whatever else the result depends
+    # on, e.g. the run length. Picklable, so it can go to pool workers.
+    def __init__(self, model, cache, **context):
+        self.model = model
+        self.cache = cache
+        self.context = context
+
+    def __call__(self, point, seed):
+        return self.cache.lookup(lambda: self.model(point, seed), self.model, point, seed, self.context)
@@ -0,0 +1,59 @@
+"""
+Struct-of-arrays customer table.
+
+Customers (or jobs) are integer ids indexing preallocated NumPy columns, so
+waiting lines and events only carry ints. The columns grow geometrically and
+slots of departed customers are recycled, so memory tracks the peak number of
+customers in the system rather than the number that ever arrived.
+"""
+
+import numpy as np
+
+DEFAULT_COLUMNS = (('arrival_time', np.float64), ('route', np.int32), ('stage', np.int32), ('group', np.int64))
+
+
+class CustomerTable:
+    def __init__(self, columns=DEFAULT_COLUMNS, capacity=256):
+        self.names = tuple(name for name, dtype in columns)
+        for name, dtype in columns:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.capacity = capacity
+        self.free = []
+        self.high_water = 0
+        self.live = 0
+        self.max_live = 0
+
+    def __len__(self):
+        return self.live
+
+    def add(self, **values):
+        if self.free:
+            cid = self.free.pop()
+        else:
+            if self.high_water == self.capacity:
+                self.grow()
+            cid = self.high_water
+            self.high_water += 1
+        for name, value in values.items():
+            getattr(self, name)[cid] = value
+        self.live += 1
+        if self.live > self.max_live:
+            self.max_live = self.live
+        return cid
+
+    def remove(self, cid):
+        self.free.append(cid)
+        self.live -= 1
+
+    def grow(self):
+        self.capacity *= 2
+        for name in self.names:
+            old = getattr(self, name)
+            new = np.zeros(self.capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def export(self):
+        # Views over every slot handed out so far; rows of departed customers
+        # hold their last values until the slot is reused.
+        return {name: getattr(self, name)[:self.high_water] for name in self.names}
@@ -0,0 +1,59 @@
+"""
+Shared discrete-event kernel used by every model.
+
+An event is a plain tuple (time, seq, code, data). `code` is a small integer
+that indexes the handler table, `seq` is a monotone counter that breaks ties
+between events scheduled for the same time in FIFO order, and `data` is
+whatever the handler needs (an int or a small tuple), so no per-event object
+holding a back-reference to the simulator is ever allocated.
+
+The pending-event set is pluggable: pass event_list='heap' (default) or
+'calendar' to pick one of the implementations in simkit.eventlist.
+"""
+
+import itertools
+
+from simkit.eventlist import make_event_list
+
+EXIT = 0
+START = 1
+ARRIVAL = 2
+DEPARTURE = 3
+
+
+class Engine:
+    def __init__(self, num_of_codes=4, event_list='heap'):
+        self.eventQ = make_event_list(event_list)
+        self.push = self.eventQ.push
+        self.clock = 0
+        self.seq = itertools.count()
+        self.handlers = [None] * num_of_codes
+        self.processed = 0
+
+    def register(self, code, handler):
+        self.handlers[code] = handler
+
+    def now(self):
+        return self.clock
+
+    def schedule(self, time, code, data=None):
+        self.push((time, next(self.seq), code, data))
+
+    def run(self):
+        handlers = self.handlers
+        pop = self.eventQ.pop
+        processed = 0
+
+        while True:
+            try:
+                time, seq, code, data = pop()
+            except IndexError:
+                break
+            if code == EXIT:
+                break
+            self.clock = time
+            handlers[code](data)
+            processed += 1
+
+        self.processed += processed
+        return processed
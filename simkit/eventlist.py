@@ -0,0 +1,120 @@
+"""
+Pending-event sets for the engine.
+
+Both implementations store the engine's (time, seq, code, data) tuples and
+expose push(item), pop() and len(). HeapEventList is a binary heap;
+CalendarEventList is Brown's calendar queue, which gives O(1) amortized
+enqueue/dequeue when event times are spread evenly, and resizes its bucket
+array (re-estimating the bucket width) as the number of pending events grows
+or shrinks.
+"""
+
+import heapq
+import math
+from bisect import insort
+from functools import partial
+
+
+class HeapEventList:
+    def __init__(self):
+        self.items = []
+        self.push = partial(heapq.heappush, self.items)
+        self.pop = partial(heapq.heappop, self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class CalendarEventList:
+    def __init__(self, num_of_buckets=2, width=1.0):
+        self.size = 0
+        self.far = []  # events at infinite time, e.g. an exit sentinel
+        self.setup(num_of_buckets, width, 0.0)
+
+    def __len__(self):
+        return self.size + len(self.far)
+
+    def setup(self, num_of_buckets, width, start):
+        self.buckets = [[] for _ in range(num_of_buckets)]
+        self.num_of_buckets = num_of_buckets
+        self.width = width
+        self.last_time = start
+        # Events are filed by their virtual bucket int(time / width), which
+        # is monotone in time; the calendar position is that modulo the number
+        # of buckets. Comparing integers rather than accumulated bucket tops
+        # keeps pop() in time order however the width rounds.
+        self.last_virtual = int(start / width)
+        self.top_threshold = 2 * num_of_buckets
+        self.bottom_threshold = num_of_buckets // 2 - 2
+
+    def push(self, item):
+        time = item[0]
+        if time == math.inf:
+            heapq.heappush(self.far, item)
+            return
+        # Buckets stay short, so sorted insertion into a list is cheap.
+        insort(self.buckets[int(time / self.width) % self.num_of_buckets], item)
+        self.size += 1
+        if self.size > self.top_threshold:
+            self.resize(2 * self.num_of_buckets)
+
+    def pop(self):
+        if self.size == 0:
+            return heapq.heappop(self.far)
+
+        buckets = self.buckets
+        num_of_buckets = self.num_of_buckets
+        width = self.width
+        virtual = self.last_virtual
+        i = virtual % num_of_buckets
+        for _ in range(num_of_buckets):
+            bucket = buckets[i]
+            if bucket and int(bucket[0][0] / width) <= virtual:
+                return self.take(i, virtual)
+            i += 1
+            virtual += 1
+            if i == num_of_buckets:
+                i = 0
+
+        # A full year went by without a hit: jump straight to the earliest event.
+        best = min((bucket[0], idx) for idx, bucket in enumerate(buckets) if bucket)[1]
+        return self.take(best, int(buckets[best][0][0] / width))
+
+    def take(self, i, virtual):
+        item = self.buckets[i].pop(0)
+        self.size -= 1
+        self.last_virtual = virtual
+        self.last_time = item[0]
+        if self.size < self.bottom_threshold:
+            self.resize(self.num_of_buckets // 2)
+        return item
+
+    def resize(self, num_of_buckets):
+        items = []
+        for bucket in self.buckets:
+            items.extend(bucket)
+        items.sort()
+        self.setup(max(num_of_buckets, 2), self.new_width(items), self.last_time)
+        for item in items:
+            insort(self.buckets[int(item[0] / self.width) % self.num_of_buckets], item)
+
+    def new_width(self, items):
+        # Brown's estimate: three times the average separation of the events
+        # nearest the head, ignoring separations far above the average.
+        sample = [item[0] for item in items[:25]]
+        if len(sample) < 2:
+            return self.width
+        gaps = [b - a for a, b in zip(sample, sample[1:])]
+        average = sum(gaps) / len(gaps)
+        close = [gap for gap in gaps if gap < 2 * average]
+        if not close or sum(close) == 0:
+            return self.width
+        return 3 * sum(close) / len(close)
+
+
+def make_event_list(kind):
+    if kind == 'heap':
+        return HeapEventList()
+    if kind == 'calendar':
+        return CalendarEventList()
+    raise ValueError('Unknown event list: %s' % kind)
@@ -0,0 +1,62 @@
+"""
+Index structures for choosing among many parallel lines.
+
+ShortestQueueIndex keeps the lengths of k queues in a segment tree whose
+internal nodes hold the minimum of their children, ties going to the left
+child. The root is then the left-most shortest queue: reading it is O(1), and
+changing one queue's length (a join, a departure or a jockeying move) updates
+the log2(k) nodes above it.
+"""
+
+import math
+
+
+class ShortestQueueIndex:
+    def __init__(self, k):
+        self.k = k
+        size = 1
+        while size < k:
+            size *= 2
+        self.size = size
+        # Node n covers leaves of its subtree; leaves live at size + i.
+        # Padding leaves are infinitely long so they are never chosen.
+        self.length = [math.inf] * (2 * size)
+        self.index = [0] * (2 * size)
+        for i in range(size):
+            self.index[size + i] = i
+        for i in range(k):
+            self.length[size + i] = 0
+        for node in range(size - 1, 0, -1):
+            self.pull(node)
+
+    def pull(self, node):
+        left = 2 * node
+        right = left + 1
+        if self.length[right] < self.length[left]:
+            self.length[node] = self.length[right]
+            self.index[node] = self.index[right]
+        else:
+            self.length[node] = self.length[left]
+            self.index[node] = self.index[left]
+
+    def update(self, i, length):
+        lengths = self.length
+        indices = self.index
+        node = self.size + i
+        lengths[node] = length
+        node //= 2
+        while node:
+            left = 2 * node
+            child = left + 1 if lengths[left + 1] < lengths[left] else left
+            if lengths[node] == lengths[child] and indices[node] == indices[child]:
+                break  # nothing above this node changes either
+            lengths[node] = lengths[child]
+            indices[node] = indices[child]
+            node //= 2
+
+    def shortest(self):
+        # Index of the left-most shortest queue.
+        return self.index[1]
+
+    def __getitem__(self, i):
+        return self.length[self.size + i]
@@ -0,0 +1,112 @@
+"""
+Vectorized multiplicative linear congruential generator.
+
+LCG produces z[i] = a**i * seed mod m, and u[i] = z[i] / m, without walking
+the recurrence one element at a time. The multipliers a**0 .. a**(block-1)
+mod m are computed once by repeated doubling; a block of the sequence that
+starts at z[s] is then z[s] * powers mod m, one NumPy multiply and one
+reduction, and the next block starts from z[s] * a**block mod m. Any element
+can be reached directly with the jump-ahead a**j mod m, so blocks are
+independent and can be filled by several threads (NumPy releases the GIL in
+these loops) or written straight into a memory-mapped file.
+
+All arithmetic is in uint64, which holds the product of two residues for any
+modulus up to 2**32. The longest sequence generated so far is kept, so asking
+for a shorter sample returns a prefix of it instead of generating it again.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class LCG:
+    def __init__(self, seed, a=65539, m=2 ** 31, block=2 ** 20):
+        if not 1 < m <= 2 ** 32:
+            raise ValueError('Modulus must be in 2..2**32: %s' % m)
+        self.seed = seed % m
+        self.a = a % m
+        self.m = m
+        self.block = block
+        self.mask = m - 1 if m & (m - 1) == 0 else None
+        self.powers = self.multipliers(block)
+        self.z_prefix = np.empty(0, dtype=np.uint64)
+
+    def reduce(self, values):
+        if self.mask is not None:
+            return np.bitwise_and(values, np.uint64(self.mask), out=values)
+        return np.remainder(values, np.uint64(self.m), out=values)
+
+    def multipliers(self, n):
+        # a**j mod m for j = 0..n-1, doubling the filled length each step.
+        powers = np.empty(n, dtype=np.uint64)
+        powers[0] = 1
+        filled = 1
+        while filled < n:
+            step = min(filled, n - filled)
+            chunk = powers[:step] * np.uint64(pow(self.a, filled, self.m))
+            powers[filled:filled + step] = self.reduce(chunk)
+            filled += step
+        return powers
+
+    def jump(self, i):
+        # z[i], reached directly from the seed.
+        return self.seed * pow(self.a, i, self.m) % self.m
+
+    def fill_z(self, out, start):
+        # Writes z[start:start + len(out)] into `out` block by block.
+        z = self.jump(start)
+        stride = pow(self.a, self.block, self.m)
+        for offset in range(0, len(out), self.block):
+            count = min(self.block, len(out) - offset)
+            target = out[offset:offset + count]
+            np.multiply(self.powers[:count], np.uint64(z), out=target)
+            self.reduce(target)
+            z = z * stride % self.m
+
+    def z(self, start, stop):
+        out = np.empty(stop - start, dtype=np.uint64)
+        self.fill_z(out, start)
+        return out
+
+    def u(self, start, stop):
+        return self.z(start, stop) / self.m
+
+    def prefix(self, n):
+        # z[0:n], extending the stored prefix only by the part not yet made.
+        have = len(self.z_prefix)
+        if n > have:
+            self.z_prefix = np.concatenate([self.z_prefix, self.z(have, n)])
+        return self.z_prefix[:n]
+
+    def blocks(self, n, start=0):
+        # u[start:start + n] one block at a time, for tests that stream.
+        for offset in range(start, start + n, self.block):
+            yield self.u(offset, min(offset + self.block, start + n))
+
+    def fill(self, out, start=0, workers=1):
+        # Writes u[start:start + len(out)] into `out`, e.g. a memmap, with
+        # `workers` threads each taking whole blocks.
+        def work(offset):
+            stop = min(offset + self.block, len(out))
+            out[offset:stop] = self.u(start + offset, start + stop)
+
+        offsets = range(0, len(out), self.block)
+        if workers > 1:
+            with ThreadPoolExecutor(workers) as executor:
+                list(executor.map(work, offsets))
+        else:
+            for offset in offsets:
+                work(offset)
+        return out
+
+    def generate(self, n, path=None, workers=1):
+        # u[0:n] in memory, or in a .npy file at `path` opened as a memmap.
+        if path is None:
+            out = np.empty(n)
+        else:
+            out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(n,))
+        self.fill(out, 0, workers)
+        if path is not None:
+            out.flush()
+        return out
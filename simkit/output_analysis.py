@@ -0,0 +1,123 @@
+"""
+Steady-state output analysis of a single long run.
+
+A BatchMeansAnalyzer is fed one observation at a time (for example each
+customer's delay in queue) and keeps at most `max_batches` batch means: it
+starts with batches of 5, as MSER-5 prescribes, and whenever the store fills
+up adjacent batches are merged and the batch size doubles, so memory stays
+constant however long the run is.
+
+result() picks the warm-up truncation point with the MSER rule on the stored
+batch means (the d minimising the variance of the remaining means divided by
+their count, searched over the first half of the run), then regroups what is
+left into `num_of_batches` equal batches for a batch-means confidence
+interval.
+"""
+
+import math
+
+import numpy as np
+
+
+class SteadyStateResult:
+    def __init__(self, mean, half_width, truncated, observations, num_of_batches):
+        self.mean = mean
+        self.half_width = half_width
+        self.truncated = truncated
+        self.observations = observations
+        self.num_of_batches = num_of_batches
+
+    def __repr__(self):
+        return 'SteadyStateResult(mean=%s, half_width=%s, truncated=%d of %d)' % (self.mean, self.half_width, self.truncated, self.observations)
+
+
+class BatchMeansAnalyzer:
+    def __init__(self, max_batches=1024, batch_size=5):
+        self.max_batches = max_batches
+        self.batch_size = batch_size
+        self.means = []
+        self.total = 0.0
+        self.count = 0
+        self.observations = 0
+
+    def add(self, value):
+        self.total += value
+        self.count += 1
+        self.observations += 1
+        if self.count == self.batch_size:
+            self.close_batch()
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        i = 0
+        while i < len(values):
+            if self.count:
+                chunk = values[i:i + self.batch_size - self.count]
+                self.total += float(chunk.sum())
+                self.count += len(chunk)
+                self.observations += len(chunk)
+                i += len(chunk)
+                if self.count == self.batch_size:
+                    self.close_batch()
+                continue
+            full = min((len(values) - i) // self.batch_size, self.max_batches - len(self.means))
+            if full == 0:
+                for value in values[i:].tolist():
+                    self.add(value)
+                return
+            end = i + full * self.batch_size
+            self.means.extend(values[i:end].reshape(full, self.batch_size).mean(axis=1).tolist())
+            self.observations += end - i
+            i = end
+            if len(self.means) >= self.max_batches:
+                self.collapse()
+
+    def close_batch(self):
+        self.means.append(self.total / self.batch_size)
+        self.total = 0.0
+        self.count = 0
+        if len(self.means) >= self.max_batches:
+            self.collapse()
+
+    def collapse(self):
+        # Merging pairs keeps every stored mean an average over batch_size
+        # observations; a partial batch in progress carries over unchanged.
+        means = self.means
+        self.means = [(means[j] + means[j + 1]) / 2 for j in range(0, len(means) - 1, 2)]
+        if len(means) % 2:
+            self.total += means[-1] * self.batch_size
+            self.count += self.batch_size
+        self.batch_size *= 2
+        if self.count >= self.batch_size:
+            self.close_batch()
+
+    def truncation(self):
+        # Returns the number of stored batch means to delete as warm-up.
+        means = np.asarray(self.means)
+        n = len(means)
+        if n < 4:
+            return 0
+        tail_sums = np.cumsum(means[::-1])[::-1]
+        tail_squares = np.cumsum((means ** 2)[::-1])[::-1]
+        remaining = np.arange(n, 0, -1)
+        half = n // 2
+        sse = tail_squares[:half] - tail_sums[:half] ** 2 / remaining[:half]
+        return int(np.argmin(sse / remaining[:half] ** 2))
+
+    def result(self, confidence=0.95, num_of_batches=20):
+        from scipy import stats
+
+        deleted = self.truncation()
+        kept = np.asarray(self.means[deleted:])
+        if len(kept) == 0:
+            return SteadyStateResult(math.nan, math.inf, 0, self.observations, 0)
+        num_of_batches = min(num_of_batches, len(kept))
+        size = len(kept) // num_of_batches
+        grouped = kept[len(kept) - size * num_of_batches:].reshape(num_of_batches, size).mean(axis=1)
+        mean = float(kept.mean())
+        if num_of_batches > 1:
+            t = stats.t.ppf((1 + confidence) / 2, num_of_batches - 1)
+            half_width = float(t * grouped.std(ddof=1) / math.sqrt(num_of_batches))
+        else:
+            half_width = math.inf
+        return SteadyStateResult(mean, half_width, deleted * self.batch_size, self.observations, num_of_batches)
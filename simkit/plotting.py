@@ -0,0 +1,28 @@
+"""
+Render step for stored sweep results.
+
+matplotlib is imported only when a plot is actually rendered, with the
+non-interactive Agg backend, and figures go to image files rather than a
+window, so simulation workers and headless batch runs never load it.
+"""
+
+
+def render(table, x, panels, image, xlabel=None):
+    # One stacked panel per (column, ylabel[, reference]) in `panels`, all
+    # against column `x`; a matching '<column>_hw' column is drawn as error
+    # bars and a reference column (e.g. the analytical value) as a dashed line.
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(len(panels), 1, figsize=(6.4, 2.4 * len(panels)), squeeze=False)
+    for ax, (column, ylabel, *reference) in zip(axes[:, 0], panels):
+        ax.errorbar(table[x], table[column], yerr=table.get(column + '_hw'), capsize=2)
+        if reference:
+            ax.plot(table[x], table[reference[0]], linestyle='--')
+        ax.set_xlabel(xlabel or x)
+        ax.set_ylabel(ylabel)
+    fig.tight_layout()
+    fig.savefig(image)
+    plt.close(fig)
+    return image
@@ -0,0 +1,126 @@
+"""
+Waiting lines with O(1) FIFO/LIFO and O(log n) priority disciplines.
+
+Every line keeps its own length counters: the current length, the maximum
+length, the number of entries and the time-integrated length (area), which is
+brought up to date on each push/pop so models do not have to rescan their
+queues on every event.
+"""
+
+import heapq
+import itertools
+from collections import deque
+
+
+class WaitingLine:
+    # Lines are observed from time 0, when every model creates them.
+    def __init__(self):
+        self.area = 0.0
+        self.last_time = 0.0
+        self.max_length = 0
+        self.entered = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return len(self.items) > 0
+
+    def advance(self, now):
+        self.area += len(self.items) * (now - self.last_time)
+        self.last_time = now
+
+    def entering(self, now):
+        self.advance(now)
+        self.entered += 1
+        if len(self.items) >= self.max_length:
+            self.max_length = len(self.items) + 1
+
+    def time_average(self, now):
+        if now <= 0:
+            return 0.0
+        return (self.area + len(self.items) * (now - self.last_time)) / now
+
+
+class FIFOQueue(WaitingLine):
+    def __init__(self):
+        super().__init__()
+        self.items = deque()
+
+    def push(self, item, now):
+        self.entering(now)
+        self.items.append(item)
+
+    def pop(self, now):
+        self.advance(now)
+        return self.items.popleft()
+
+    def peek(self):
+        return self.items[0]
+
+    def steal_tail(self, now):
+        # Removes the customer who would be served last, e.g. for jockeying.
+        self.advance(now)
+        return self.items.pop()
+
+
+class LIFOQueue(WaitingLine):
+    def __init__(self):
+        super().__init__()
+        self.items = deque()
+
+    def push(self, item, now):
+        self.entering(now)
+        self.items.append(item)
+
+    def pop(self, now):
+        self.advance(now)
+        return self.items.pop()
+
+    def peek(self):
+        return self.items[-1]
+
+    def steal_tail(self, now):
+        self.advance(now)
+        return self.items.popleft()
+
+
+class PriorityQueue(WaitingLine):
+    # Lower priority values are served first; ties are served FIFO.
+    def __init__(self):
+        super().__init__()
+        self.items = []
+        self.seq = itertools.count()
+
+    def push(self, item, now, priority=0):
+        self.entering(now)
+        heapq.heappush(self.items, (priority, next(self.seq), item))
+
+    def pop(self, now):
+        self.advance(now)
+        return heapq.heappop(self.items)[2]
+
+    def peek(self):
+        return self.items[0][2]
+
+    def steal_tail(self, now):
+        # The last customer in service order sits among the heap leaves, so
+        # this is O(n); jockeying models normally use FIFO lines.
+        self.advance(now)
+        last = max(range(len(self.items)), key=self.items.__getitem__)
+        entry = self.items[last]
+        self.items[last] = self.items[-1]
+        self.items.pop()
+        if last < len(self.items):
+            heapq.heapify(self.items)
+        return entry[2]
+
+
+def make_queue(discipline):
+    if discipline == 'fifo':
+        return FIFOQueue()
+    if discipline == 'lifo':
+        return LIFOQueue()
+    if discipline == 'priority':
+        return PriorityQueue()
+    raise ValueError('Unknown queue discipline: %s' % discipline)
@@ -0,0 +1,65 @@
+"""
+Event-list-free engines for FCFS queues fed by arrays of interarrival and
+service times.
+
+For a single server the Lindley recursion W[n+1] = max(0, W[n] + S[n] - A[n+1])
+has the closed form W[n] = C[n] - min(C[0..n]) with C the running sum of
+S[n-1] - A[n] and C[0] = 0, so every delay comes out of two cumulative NumPy
+passes.
+
+With k servers the Kiefer-Wolfowitz recursion carries the vector of residual
+workloads seen by an arrival, sorted ascending: the arrival's delay is the
+smallest component, its service time is added to that component, and the
+vector is shifted by the next interarrival time and re-sorted. Only the
+smallest component is ever read, so the vector is kept in absolute time (the
+instants at which each server frees up) as a binary heap, which makes each
+update O(log k) with no event list at all.
+"""
+
+import heapq
+
+import numpy as np
+
+
+def lindley(interarrivals, services):
+    interarrivals = np.asarray(interarrivals, dtype=np.float64)
+    services = np.asarray(services, dtype=np.float64)
+    steps = np.empty(len(services))
+    steps[0] = 0.0
+    np.subtract(services[:-1], interarrivals[1:], out=steps[1:])
+    running = np.cumsum(steps)
+    return running - np.minimum.accumulate(running)
+
+
+def kiefer_wolfowitz(interarrivals, services, k):
+    if k == 1:
+        return lindley(interarrivals, services)
+    arrivals = np.cumsum(interarrivals)
+    starts = []
+    start = starts.append
+    free_at = [0.0] * k
+    replace = heapq.heapreplace
+    for arrival, service in zip(arrivals.tolist(), np.asarray(services, dtype=np.float64).tolist()):
+        earliest = free_at[0]
+        if earliest > arrival:
+            arrival = earliest
+        start(arrival)
+        replace(free_at, arrival + service)
+    return np.array(starts) - arrivals
+
+
+def queue_summary(interarrivals, services, delays, servers=1):
+    # Same quantities States.finish reports for a run that ends when the
+    # last customer leaves: the area under the queue-length curve equals the
+    # total delay, and the busy area equals the total service time.
+    arrivals = np.cumsum(interarrivals)
+    end_time = float(np.max(arrivals + delays + services))
+    total_delay = float(np.sum(delays))
+    return {
+        'served': len(delays),
+        'end_time': end_time,
+        'total_delay': total_delay,
+        'avgQlength': total_delay / end_time,
+        'avgQdelay': total_delay / len(delays),
+        'util': float(np.sum(services)) / (servers * end_time),
+    }
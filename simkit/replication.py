@@ -0,0 +1,180 @@
+"""
+Independent replications fanned out over a process pool.
+
+A model is a picklable function model(point, seed) -> {metric: value}, where
+`point` is one parameter point of a sweep and `seed` a numpy SeedSequence; a
+value may be a scalar or a per-station/per-type vector, summarized by a
+Summary, or a mergeable accumulator such as a quantile sketch (or a list of
+them), pooled across replications with merge(). Every replication's seed is
+derived from the root seed by its (point, replication) index with
+SeedSequence.spawn, and results are gathered in task order, so the summaries
+do not depend on how many workers ran them.
+
+run_until_precision() is the sequential procedure: it keeps adding batches
+of replications to each point until every targeted metric's confidence
+interval is narrow enough, or the replication cap is hit.
+"""
+
+import copy
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+class Summary:
+    def __init__(self, values, confidence=0.95):
+        values = np.asarray(values, dtype=np.float64)
+        self.n = len(values)
+        self.confidence = confidence
+        self.mean = values.mean(axis=0)
+        if self.n > 1:
+            from scipy import stats  # only needed once results are summarized
+
+            self.variance = values.var(axis=0, ddof=1)
+            t = stats.t.ppf((1 + confidence) / 2, self.n - 1)
+            self.half_width = t * np.sqrt(self.variance / self.n)
+        else:
+            self.variance = np.full_like(self.mean, math.nan)
+            self.half_width = np.full_like(self.mean, math.inf)
+
+    def interval(self):
+        return self.mean - self.half_width, self.mean + self.half_width
+
+    def precise(self, relative=None, absolute=None):
+        # Relative precision uses the adjusted target gamma / (1 + gamma), so
+        # the relative error of the mean itself is at most gamma.
+        if self.n < 2:
+            return False
+        if absolute is not None and np.any(self.half_width > absolute):
+            return False
+        if relative is not None and np.any(self.half_width > relative / (1 + relative) * np.abs(self.mean)):
+            return False
+        return True
+
+    def __repr__(self):
+        return 'Summary(n=%d, mean=%s, half_width=%s)' % (self.n, self.mean, self.half_width)
+
+
+def point_seeds(seed, num_of_points):
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(num_of_points)
+
+
+def call_model(task):
+    model, point, seed = task
+    return model(point, seed)
+
+
+def map_tasks(executor, tasks):
+    if executor is None:
+        return [call_model(task) for task in tasks]
+    return list(executor.map(call_model, tasks))
+
+
+def make_executor(workers):
+    return None if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+
+
+def run_tasks(tasks, workers=None):
+    executor = make_executor(workers)
+    if executor is None:
+        return map_tasks(None, tasks)
+    with executor:
+        return map_tasks(executor, tasks)
+
+
+def pool(values):
+    # Merges mergeable accumulators (sketches, tallies) from all replications
+    # into a copy of the first.
+    pooled = copy.deepcopy(values[0])
+    for value in values[1:]:
+        pooled.merge(value)
+    return pooled
+
+
+def combine(values, confidence=0.95):
+    first = values[0]
+    if hasattr(first, 'merge'):
+        return pool(values)
+    if isinstance(first, list) and first and hasattr(first[0], 'merge'):
+        return [pool(column) for column in zip(*values)]
+    return Summary(values, confidence)
+
+
+def summarize(results, confidence=0.95):
+    return {metric: combine([result[metric] for result in results], confidence) for metric in results[0]}
+
+
+def run_replications(model, points, replications, seed, workers=None, confidence=0.95):
+    # Returns one {metric: Summary} dict per point, in the order of `points`.
+    points = list(points)
+    seeds = [point_seed.spawn(replications) for point_seed in point_seeds(seed, len(points))]
+    tasks = [(model, point, seeds[i][r]) for i, point in enumerate(points) for r in range(replications)]
+    results = run_tasks(tasks, workers)
+    return [summarize(results[i * replications:(i + 1) * replications], confidence) for i in range(len(points))]
+
+
+def first_precise(results, start, relative, absolute, confidence):
+    # Smallest n >= start whose first n replications meet every target, or
+    # None. Only the targeted metrics are summarized for each prefix.
+    metrics = set(relative) | set(absolute)
+    values = {metric: [result[metric] for result in results] for metric in metrics}
+    for n in range(start, len(results) + 1):
+        if all(Summary(values[metric][:n], confidence).precise(relative=relative.get(metric), absolute=absolute.get(metric))
+               for metric in metrics):
+            return n
+    return None
+
+
+def run_until_precision(model, points, seed, relative=None, absolute=None, min_replications=5,
+                        max_replications=1000, batch=None, workers=None, confidence=0.95):
+    # relative/absolute map metric names to the CI half-width target for that
+    # metric. Seeds are spawned in the same order as run_replications, so a
+    # point that stops after n replications matches run_replications(..., n).
+    # Replications run in batches (by default one per worker) but the
+    # stopping rule is applied to every prefix in replication order, so the
+    # point stops at the same n, and gives the same estimates, whatever the
+    # batch size or number of workers; replications past n are dropped.
+    relative = relative or {}
+    absolute = absolute or {}
+    points = list(points)
+    seeds = point_seeds(seed, len(points))
+    batch = batch or workers or os.cpu_count() or 1
+    results = [[] for _ in points]
+    summaries = [None] * len(points)
+    checked = [min_replications] * len(points)
+    pending = list(range(len(points)))
+
+    executor = make_executor(workers)
+    try:
+        while pending:
+            tasks = []
+            owners = []
+            for i in pending:
+                count = max(batch, min_replications - len(results[i]))
+                count = min(count, max_replications - len(results[i]))
+                tasks.extend((model, points[i], child) for child in seeds[i].spawn(count))
+                owners.extend([i] * count)
+            for i, result in zip(owners, map_tasks(executor, tasks)):
+                results[i].append(result)
+
+            still_pending = []
+            for i in pending:
+                n = None
+                if len(results[i]) >= checked[i]:
+                    n = first_precise(results[i], checked[i], relative, absolute, confidence)
+                    checked[i] = len(results[i]) + 1
+                if n is not None:
+                    del results[i][n:]
+                elif len(results[i]) < max_replications:
+                    still_pending.append(i)
+                    continue
+                summaries[i] = summarize(results[i], confidence)
+            pending = still_pending
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return summaries
@@ -0,0 +1,140 @@
+"""
+Append-only store for sweep results.
+
+Each row is one parameter point of one run of an experiment: the run id, the
+parameters, the root seed and replication count, and for every metric its
+mean and CI half-width (vector metrics get one column per component, pooled
+quantile sketches one column per reported quantile). Rows are appended to a
+CSV file, so several runs accumulate in the same file and nothing already
+written is ever rewritten; load() reads it back column by column.
+
+The columns are fixed by the first write. Later rows may leave some of them
+out (a k = 1 point has fewer per-server columns than a k = 4 one), which load()
+returns as nan, but cannot add new ones. The header is read when the store is
+opened. If a sweep's rows bring new columns (its metrics changed), they go to
+the first free or compatible sibling file (experiment2-2.csv, -3, ...) with a
+warning, so the results of a finished sweep are never refused.
+"""
+
+import csv
+import os
+import time
+import uuid
+import warnings
+
+import numpy as np
+
+from simkit.sketches import QUANTILES
+
+
+def new_run_id():
+    return '%s-%s' % (time.strftime('%Y%m%d-%H%M%S'), uuid.uuid4().hex[:8])
+
+
+def flatten(summary):
+    # {metric: Summary | sketch | [sketch]} -> flat {column: value}.
+    row = {}
+    for metric, value in summary.items():
+        if isinstance(value, list):
+            for i, sketch in enumerate(value):
+                for q, x in zip(QUANTILES, sketch.quantiles(QUANTILES).tolist()):
+                    row['%s_%d_p%g' % (metric, i, 100 * q)] = x
+        elif hasattr(value, 'quantiles'):
+            for q, x in zip(QUANTILES, value.quantiles(QUANTILES).tolist()):
+                row['%s_p%g' % (metric, 100 * q)] = x
+        else:
+            mean = np.atleast_1d(value.mean)
+            half_width = np.atleast_1d(value.half_width)
+            if np.ndim(value.mean) == 0:
+                row[metric] = float(mean[0])
+                row[metric + '_hw'] = float(half_width[0])
+            else:
+                for i in range(len(mean)):
+                    row['%s_%d' % (metric, i)] = float(mean[i])
+                    row['%s_%d_hw' % (metric, i)] = float(half_width[i])
+    return row
+
+
+class ResultStore:
+    def __init__(self, path):
+        self.path = path
+        self.stored = self.columns()
+
+    def columns(self, path=None):
+        path = path or self.path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, newline='') as file:
+            return next(csv.reader(file))
+
+    def fits(self, columns, rows):
+        return columns is None or all(set(row) <= set(columns) for row in rows)
+
+    def fallback(self, rows):
+        # First sibling path that is empty or whose header takes the rows.
+        base, extension = os.path.splitext(self.path)
+        i = 2
+        while True:
+            path = '%s-%d%s' % (base, i, extension)
+            columns = self.columns(path)
+            if self.fits(columns, rows):
+                return path, columns
+            i += 1
+
+    def extend(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        columns = self.stored
+        if not self.fits(columns, rows):
+            path, columns = self.fallback(rows)
+            warnings.warn('%s: stored columns do not match this run; writing to %s instead' % (self.path, path))
+            self.path = path
+        header = columns is None
+        if header:
+            columns = list(dict.fromkeys(name for row in rows for name in row))
+        with open(self.path, 'a', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns, restval='')
+            if header:
+                writer.writeheader()
+            writer.writerows(rows)
+        self.stored = columns
+
+    def append(self, row):
+        self.extend([row])
+
+    def load(self):
+        # Returns {column: numpy array}; numeric columns come back as floats.
+        with open(self.path, newline='') as file:
+            reader = csv.reader(file)
+            columns = next(reader)
+            values = list(zip(*reader)) or [()] * len(columns)
+        table = {}
+        for name, column in zip(columns, values):
+            try:
+                table[name] = np.array([value or 'nan' for value in column], dtype=np.float64)
+            except ValueError:
+                table[name] = np.array(column)
+        return table
+
+
+def summary_row(run, seed, params, summary):
+    # One store row for a parameter point: the run id, the Params fields,
+    # the root seed, the replication count and the flattened summary.
+    row = {'run': run}
+    row.update(vars(params))
+    row['seed'] = seed
+    row['replications'] = next(value.n for value in summary.values() if hasattr(value, 'n'))
+    row.update(flatten(summary))
+    return row
+
+
+def select(table, **criteria):
+    # Rows of a loaded table whose columns equal the given values; run='last'
+    # picks the most recently appended run.
+    if criteria.get('run') == 'last':
+        criteria['run'] = table['run'][-1] if len(table['run']) else None
+    mask = np.ones(len(next(iter(table.values()))), dtype=bool)
+    for name, value in criteria.items():
+        mask &= table[name] == value
+    return {name: column[mask] for name, column in table.items()}
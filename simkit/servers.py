@@ -0,0 +1,57 @@
+"""
+Pools of identical servers.
+
+IdleServerPool keeps the idle servers of a station in a binary min-heap, so
+handing out a server and taking one back are O(log k) however many servers
+there are. With policy 'lowest' the heap holds server indices and acquire()
+returns the lowest-indexed idle server; with 'lru' it holds (release time,
+index) pairs and returns the server that has been idle the longest.
+
+The pool also times each server's busy periods, which gives per-server
+utilization as well as the station's.
+"""
+
+import heapq
+
+import numpy as np
+
+
+class IdleServerPool:
+    def __init__(self, k, policy='lowest', start=0.0):
+        if policy not in ('lowest', 'lru'):
+            raise ValueError('Unknown server policy: %s' % policy)
+        self.k = k
+        self.policy = policy
+        self.start = start
+        self.idle = list(range(k)) if policy == 'lowest' else [(start, i) for i in range(k)]
+        self.busy_since = [None] * k
+        self.busy_time = [0.0] * k
+
+    def __len__(self):
+        # Number of idle servers.
+        return len(self.idle)
+
+    def busy(self):
+        return self.k - len(self.idle)
+
+    def acquire(self, now):
+        entry = heapq.heappop(self.idle)
+        server = entry if self.policy == 'lowest' else entry[1]
+        self.busy_since[server] = now
+        return server
+
+    def release(self, server, now):
+        self.busy_time[server] += now - self.busy_since[server]
+        self.busy_since[server] = None
+        heapq.heappush(self.idle, server if self.policy == 'lowest' else (now, server))
+
+    def busy_times(self, now):
+        # Busy time of every server up to `now`, counting periods in progress.
+        return np.array([busy + (now - since if since is not None else 0.0)
+                         for busy, since in zip(self.busy_time, self.busy_since)])
+
+    def utilization(self, now):
+        # Per-server fraction of time busy since the pool was created.
+        if now <= self.start:
+            return np.zeros(self.k)
+        return self.busy_times(now) / (now - self.start)
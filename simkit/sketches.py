@@ -0,0 +1,150 @@
+"""
+Mergeable quantile sketches for delay distributions.
+
+KLLSketch is the KLL sketch of Karnin, Lang and Liberty: a stack of
+compactors, where an item at height h stands for 2**h observations. When a
+compactor fills up it is sorted and every other item (odd or even positions,
+by a fair coin) moves up one level. Capacities shrink geometrically by 2/3
+going down from the top, so the sketch holds O(k) items however many
+observations it has seen.
+
+Error guarantee: a quantile query returns a value whose rank differs from the
+requested one by at most about eps * n, where eps shrinks as 1/k. The
+additive rank error is O(1/k) with constant failure probability; with the
+default k = 200, eps is about 0.0165 at 99% confidence. Tails are where
+absolute rank error matters most: P99 from a k = 200 sketch lies between the
+true P97.4 and P100. The exact minimum and maximum are kept on the side.
+
+Merging two sketches gives the same guarantee as one sketch fed both streams,
+so sketches from parallel replications can be pooled with merge(). The coin
+flips come from the sketch's own `seed` (an int or a SeedSequence, which is
+read but not spawned from), so a seeded run gives the same quantiles every
+time and does not disturb the model's random streams.
+
+QUANTILES are the delay percentiles the models report (P50, P95, P99).
+"""
+
+import math
+import random
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class KLLSketch:
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        if isinstance(seed, np.random.SeedSequence):
+            seed = int(seed.generate_state(1, np.uint64)[0])
+        self.random = random.Random(seed)
+        self.compactors = []
+        self.size = 0
+        self.max_size = 0
+        self.grow()
+
+    def capacity(self, height):
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.k * (2.0 / 3.0) ** depth)) + 1
+
+    def grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self.capacity(h) for h in range(len(self.compactors)))
+
+    def add(self, value):
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.compactors[0].append(value)
+        self.size += 1
+        if self.size >= self.max_size:
+            self.compress()
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        values = values.tolist()
+        # Feed level 0 one capacity at a time, as add() would.
+        i = 0
+        while i < len(values):
+            room = max(self.max_size - self.size, 1)
+            chunk = values[i:i + room]
+            self.compactors[0].extend(chunk)
+            self.count += len(chunk)
+            self.size += len(chunk)
+            i += len(chunk)
+            while self.size >= self.max_size:
+                self.compress()
+
+    def compact(self, height):
+        items = self.compactors[height]
+        items.sort()
+        keep = [items.pop()] if len(items) % 2 else []
+        offset = self.random.random() < 0.5
+        self.compactors[height] = keep
+        return items[offset::2]
+
+    def compress(self):
+        for h in range(len(self.compactors)):
+            if len(self.compactors[h]) >= self.capacity(h):
+                if h + 1 >= len(self.compactors):
+                    self.grow()
+                self.compactors[h + 1].extend(self.compact(h))
+                self.size = sum(len(items) for items in self.compactors)
+                if self.size < self.max_size:
+                    break
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.grow()
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.size = sum(len(items) for items in self.compactors)
+        while self.size >= self.max_size:
+            self.compress()
+        return self
+
+    def weighted(self):
+        # Stored items in ascending order with their cumulative weights.
+        values = np.concatenate([np.asarray(items, dtype=np.float64) for items in self.compactors])
+        weights = np.concatenate([np.full(len(items), 2 ** h, dtype=np.float64) for h, items in enumerate(self.compactors)])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.count == 0:
+            return np.full(qs.shape, math.nan)
+        values, cumulative = self.weighted()
+        idx = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        result = values[np.minimum(idx, len(values) - 1)]
+        result = np.where(qs <= 0, self.min, result)
+        return np.where(qs >= 1, self.max, result)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def rank(self, value):
+        # Estimated fraction of observations <= value.
+        if self.count == 0:
+            return math.nan
+        values, cumulative = self.weighted()
+        idx = np.searchsorted(values, value, side='right')
+        return float(cumulative[idx - 1] / cumulative[-1]) if idx else 0.0
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return 'KLLSketch(count=%d, p50=%s, p95=%s, p99=%s)' % ((self.count,) + tuple(self.quantiles(QUANTILES)))
@@ -0,0 +1,136 @@
+"""
+Job-shop model specifications.
+
+A JobShopSpec is one plant: machines per station, the mean interarrival time
+of jobs, the job-type mix and, per job type, its route through the stations
+and the mean service time at each step. It can be read from
+
+- the original text format (whitespace-separated numbers, one record per
+  line: number of stations; machines per station; mean interarrival time;
+  number of job types; job-type probabilities; route length per job type;
+  then, per job type, its route and its mean service times),
+- JSON or TOML, with the keys num_of_machines_in_each_station, mu,
+  job_probabilities, routing and mean_service_time (num_of_stations,
+  num_of_job_types and num_of_stations_for_each_job are optional and
+  checked if given).
+
+Every spec is validated on load and compiled into dense NumPy tables: routes
+and service means become (job types x longest route) arrays padded with -1
+and nan, so a plant of any size is a handful of arrays rather than nested
+lists, and the job-type mix becomes an alias table for O(1) sampling.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from simkit.variates import AliasTable
+
+
+class JobShopSpec:
+    def __init__(self, num_of_machines_in_each_station, mu, job_probabilities, routing, mean_service_time, source='<spec>'):
+        self.source = source
+        self.num_of_machines_in_each_station = np.asarray(num_of_machines_in_each_station, dtype=np.int64)
+        self.num_of_stations = len(self.num_of_machines_in_each_station)
+        self.mu = float(mu)
+        self.job_probabilities = np.asarray(job_probabilities, dtype=np.float64)
+        self.num_of_job_types = len(self.job_probabilities)
+        if len(routing) != self.num_of_job_types or len(mean_service_time) != self.num_of_job_types:
+            self.fail('expected a route and service times for each of the %d job types' % self.num_of_job_types)
+        self.num_of_stations_for_each_job = np.array([len(route) for route in routing], dtype=np.int64)
+
+        longest = int(self.num_of_stations_for_each_job.max()) if self.num_of_job_types else 0
+        self.routing = np.full((self.num_of_job_types, longest), -1, dtype=np.int64)
+        self.mean_service_time = np.full((self.num_of_job_types, longest), np.nan)
+        for i, (route, means) in enumerate(zip(routing, mean_service_time)):
+            route, means = self.check_route(i, route, means)
+            self.routing[i, :len(route)] = route
+            self.mean_service_time[i, :len(means)] = means
+        self.validate()
+        self.job_type_table = AliasTable(self.job_probabilities)
+
+    def check_route(self, i, route, means):
+        # Validated before padding, since -1 and nan are only padding there.
+        route = np.asarray(route, dtype=np.float64).ravel()
+        means = np.asarray(means, dtype=np.float64).ravel()
+        if len(means) != len(route):
+            self.fail('job type %d has %d stations on its route but %d service times' % (i, len(route), len(means)))
+        if not np.all(np.isfinite(route) & (route == np.floor(route))):
+            self.fail('job type %d has a non-integer station on its route' % i)
+        if np.any((route < 0) | (route >= self.num_of_stations)):
+            self.fail('job type %d visits stations outside 0..%d' % (i, self.num_of_stations - 1))
+        if not np.all(np.isfinite(means) & (means > 0)):
+            self.fail('job type %d has a mean service time that is not finite and positive' % i)
+        return route.astype(np.int64), means
+
+    def fail(self, message):
+        raise ValueError('%s: %s' % (self.source, message))
+
+    def validate(self):
+        if self.num_of_stations == 0 or self.num_of_job_types == 0:
+            self.fail('needs at least one station and one job type')
+        if np.any(self.num_of_machines_in_each_station < 1):
+            self.fail('every station needs at least one machine')
+        if not self.mu > 0:
+            self.fail('mean interarrival time must be positive')
+        if np.any(self.job_probabilities < 0) or not np.isclose(self.job_probabilities.sum(), 1.0):
+            self.fail('job probabilities must be non-negative and sum to 1')
+        if np.any(self.num_of_stations_for_each_job < 1):
+            self.fail('every job type needs a non-empty route')
+
+    def __repr__(self):
+        return 'JobShopSpec(%s: %d stations, %d job types)' % (self.source, self.num_of_stations, self.num_of_job_types)
+
+
+def from_dict(data, source='<spec>'):
+    try:
+        spec = JobShopSpec(data['num_of_machines_in_each_station'], data['mu'], data['job_probabilities'],
+                           data['routing'], data['mean_service_time'], source)
+    except KeyError as error:
+        raise ValueError('%s: missing key %s' % (source, error))
+    for key, value in (('num_of_stations', spec.num_of_stations), ('num_of_job_types', spec.num_of_job_types)):
+        if key in data and data[key] != value:
+            spec.fail('%s is %s but the spec describes %d' % (key, data[key], value))
+    if 'num_of_stations_for_each_job' in data and list(data['num_of_stations_for_each_job']) != spec.num_of_stations_for_each_job.tolist():
+        spec.fail('num_of_stations_for_each_job does not match the routes')
+    return spec
+
+
+def parse_text(text, source='<spec>'):
+    lines = [line.split() for line in text.splitlines() if line.strip()]
+    try:
+        num_of_stations = int(lines[0][0])
+        machines = [int(x) for x in lines[1]]
+        mu = float(lines[2][0])
+        num_of_job_types = int(lines[3][0])
+        probabilities = [float(x) for x in lines[4]]
+        route_lengths = [int(x) for x in lines[5]]
+        routing = [[int(x) for x in lines[6 + 2 * i]] for i in range(num_of_job_types)]
+        means = [[float(x) for x in lines[7 + 2 * i]] for i in range(num_of_job_types)]
+    except (IndexError, ValueError) as error:
+        raise ValueError('%s: malformed job-shop spec (%s)' % (source, error))
+    return from_dict({
+        'num_of_stations': num_of_stations, 'num_of_machines_in_each_station': machines, 'mu': mu,
+        'num_of_job_types': num_of_job_types, 'job_probabilities': probabilities,
+        'num_of_stations_for_each_job': route_lengths, 'routing': routing, 'mean_service_time': means,
+    }, source)
+
+
+def load_spec(path):
+    # Format by extension: .json, .toml, anything else is the text format.
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.toml':
+        import tomllib  # Python 3.11+
+
+        with open(path, 'rb') as file:
+            return from_dict(tomllib.load(file), path)
+    with open(path) as file:
+        text = file.read()
+    if extension == '.json':
+        return from_dict(json.loads(text), path)
+    return parse_text(text, path)
+
+
+def load_specs(paths):
+    return [load_spec(path) for path in paths]
@@ -0,0 +1,162 @@
+"""
+Block-buffered random variate streams.
+
+Drawing one variate per NumPy call costs far more than the variate itself, so
+a VariateStream fills buffers of standard variates from a numpy Generator in
+large blocks and hands them out one Python float at a time. Buffers are kept
+reversed so list.pop() yields values in generation order, and a stream that
+feeds a single distribution gives the same values through scalar and *_array
+draws. Buffers start small and double up to `block`, so short runs do not pay
+for variates they never use.
+
+Discrete distributions are compiled once into an AliasTable (Walker's alias
+method, built with Vose's algorithm), after which each draw costs one uniform,
+a multiply and a comparison whatever the number of outcomes.
+"""
+
+import numpy as np
+
+
+def spawn_streams(seed, n, block=65536):
+    # Independent streams derived from one seed, e.g. arrivals and services.
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [VariateStream(child, block) for child in seed.spawn(n)]
+
+
+class VariateStream:
+    def __init__(self, seed=None, block=65536):
+        if isinstance(seed, np.random.Generator):
+            self.generator = seed
+        else:
+            self.generator = np.random.default_rng(seed)
+        self.block = block
+        self.size = min(1024, block)
+        self.exp_buffer = []
+        self.uniform_buffer = []
+        self.gamma_buffers = {}
+
+    def refill(self, values):
+        return values[::-1].tolist()
+
+    def next_size(self):
+        size = self.size
+        self.size = min(2 * size, self.block)
+        return size
+
+    def standard_exponential(self):
+        try:
+            return self.exp_buffer.pop()
+        except IndexError:
+            self.exp_buffer = self.refill(self.generator.standard_exponential(self.next_size()))
+            return self.exp_buffer.pop()
+
+    def exponential(self, mean=1.0):
+        return mean * self.standard_exponential()
+
+    def expovariate(self, rate):
+        return self.standard_exponential() / rate
+
+    def random(self):
+        try:
+            return self.uniform_buffer.pop()
+        except IndexError:
+            self.uniform_buffer = self.refill(self.generator.random(self.next_size()))
+            return self.uniform_buffer.pop()
+
+    def uniform(self, low=0.0, high=1.0):
+        return low + (high - low) * self.random()
+
+    def gamma(self, shape, scale=1.0):
+        buffer = self.gamma_buffers.get(shape)
+        if not buffer:
+            buffer = self.refill(self.generator.standard_gamma(shape, self.next_size()))
+            self.gamma_buffers[shape] = buffer
+        return scale * buffer.pop()
+
+    def erlang(self, k, mean):
+        # Sum of k exponential phases with total mean `mean`.
+        return self.gamma(k, mean / k)
+
+    def discrete(self, p):
+        # `p` is a probability vector or an AliasTable compiled from one.
+        return DiscreteStream(self, p)
+
+    def exponential_array(self, n, mean=1.0):
+        return mean * self.take(self.exp_buffer, n, self.generator.standard_exponential)
+
+    def expovariate_array(self, n, rate):
+        return self.take(self.exp_buffer, n, self.generator.standard_exponential) / rate
+
+    def uniform_array(self, n, low=0.0, high=1.0):
+        return low + (high - low) * self.take(self.uniform_buffer, n, self.generator.random)
+
+    def take(self, buffer, n, draw):
+        # Drains what is left in a scalar buffer first so that mixing scalar
+        # and array draws keeps the stream's order.
+        head = min(n, len(buffer))
+        values = np.empty(n)
+        if head:
+            values[:head] = buffer[len(buffer) - head:][::-1]
+            del buffer[len(buffer) - head:]
+        if n > head:
+            values[head:] = draw(n - head)
+        return values
+
+
+class AliasTable:
+    # Outcome i of n is drawn by picking a column j uniformly and keeping j
+    # with probability prob[j], otherwise taking alias[j].
+    def __init__(self, p):
+        p = np.asarray(p, dtype=np.float64)
+        if p.ndim != 1 or len(p) == 0 or np.any(p < 0) or not np.isclose(p.sum(), 1.0):
+            raise ValueError('Not a probability vector: %s' % (p.tolist(),))
+        n = len(p)
+        scaled = p * (n / p.sum())
+        prob = np.ones(n)
+        alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left over is 1 up to rounding and keeps prob 1.
+        self.p = p
+        self.prob = prob
+        self.alias = alias
+        for array in (self.p, self.prob, self.alias):
+            array.setflags(write=False)
+
+    def __len__(self):
+        return len(self.prob)
+
+    def sample(self, u):
+        # Outcomes for an array of uniforms on [0, 1), one uniform per draw.
+        u = np.asarray(u) * len(self.prob)
+        column = u.astype(np.int64)
+        return np.where(u - column < self.prob[column], column, self.alias[column])
+
+
+class DiscreteStream:
+    # Indices 0..len(p)-1 drawn with probabilities p through an alias table,
+    # buffered like the others.
+    def __init__(self, stream, p):
+        self.stream = stream
+        self.table = p if isinstance(p, AliasTable) else AliasTable(p)
+        self.buffer = []
+
+    def draw(self):
+        try:
+            return self.buffer.pop()
+        except IndexError:
+            values = self.table.sample(self.stream.generator.random(self.stream.next_size()))
+            self.buffer = self.stream.refill(values)
+            return self.buffer.pop()
+
+    def draw_array(self, n):
+        draw = lambda m: self.table.sample(self.stream.generator.random(m))
+        return self.stream.take(self.buffer, n, draw).astype(np.int64)
@@ -0,0 +1,49 @@
+import math
+import warnings
+
+import numpy as np
+
+from simkit.analytical import erlang_c, mmk
+
+
+def direct_erlang_c(a, k):
+    # The textbook factorial sum, fine for small k.
+    head = sum(a ** n / math.factorial(n) for n in range(k))
+    tail = a ** k / math.factorial(k) / (1 - a / k)
+    return tail / (head + tail)
+
+
+def erlang_b_recursion(a, k):
+    # Erlang B by the stable recursion B(n) = a B(n-1) / (n + a B(n-1)),
+    # then C = k B / (k - a (1 - B)); no powers or factorials anywhere.
+    b = 1.0
+    for n in range(1, k + 1):
+        b = a * b / (n + a * b)
+    return k * b / (k - a * (1 - b))
+
+
+def test_erlang_c_matches_factorial_sum_for_small_k():
+    for k in range(1, 11):
+        for rho in (0.1, 0.5, 0.9, 0.99):
+            a = rho * k
+            assert math.isclose(float(erlang_c(a, k)), direct_erlang_c(a, k), rel_tol=1e-10)
+
+
+def test_erlang_c_large_k_does_not_overflow():
+    k, a = 2000, 1950.0
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        value = float(erlang_c(a, k))
+    try:
+        direct_erlang_c(a, k)
+        assert False, 'the factorial sum should overflow here'
+    except OverflowError:
+        pass
+    assert 0 < value < 1
+    assert math.isclose(value, erlang_b_recursion(a, k), rel_tol=1e-8)
+
+
+def test_unstable_points_wait_for_sure():
+    result = mmk([0.5, 2.0], 1.0, 1)
+    assert result['p_wait'][1] == 1.0 and result['avgQlength'][1] == np.inf
+    assert math.isclose(result['avgQlength'][0], 0.5)
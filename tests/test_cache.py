@@ -0,0 +1,42 @@
+import os
+
+from simkit import cache
+from simkit.cache import ResultCache, MISSING
+
+
+def test_unreadable_entries_are_dropped_misses(tmp_path):
+    store = ResultCache(str(tmp_path))
+    stale = [b'cno_such_module_anymore\nThing\n.', b'csimkit.cache\nRenamedClass\n.', b'not a pickle']
+    for i, payload in enumerate(stale):
+        key = store.key('stale', i)
+        with open(store.path(key), 'wb') as file:
+            file.write(payload)
+        assert store.get(key) is MISSING
+        assert not os.path.exists(store.path(key))
+
+
+def test_eviction_keeps_directory_under_cap(tmp_path):
+    store = ResultCache(str(tmp_path), max_bytes=4000)
+    for i in range(200):
+        store.put(store.key(i), list(range(20)))
+    sizes = [size for _, size, _ in store.entries()]
+    assert sum(sizes) <= 4000
+    assert store.total == sum(sizes)
+    assert store.get(store.key(199)) == list(range(20))
+
+
+def model_from(path, source):
+    with open(path, 'w') as file:
+        file.write(source)
+    namespace = {}
+    exec(compile(source, str(path), 'exec'), namespace)
+    cache.source_hashes.clear()
+    return namespace['model']
+
+
+def test_editing_a_model_changes_its_key(tmp_path):
+    store = ResultCache(str(tmp_path / 'cache'))
+    path = tmp_path / 'model.py'
+    before = store.key(model_from(path, 'def model(point, seed):\n    return point\n'), 1, 2)
+    after = store.key(model_from(path, 'def model(point, seed):\n    return 2 * point\n'), 1, 2)
+    assert before != after
@@ -0,0 +1,46 @@
+import os
+import runpy
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+tester = runpy.run_path(os.path.join(ROOT, 'Offline_3-Empirical Testing.py'), run_name='script')
+
+
+def baseline_runs(u):
+    # The original runs_test loop.
+    r = [0] * 6
+    cur_length = 1
+    for i in range(1, len(u)):
+        if u[i] >= u[i - 1]:
+            cur_length += 1
+        else:
+            r[min(5, cur_length - 1)] += 1
+            cur_length = 1
+        if i == len(u) - 1:
+            r[min(5, cur_length - 1)] += 1
+    return r
+
+
+def test_runs_counter_matches_baseline_across_chunkings():
+    rng = np.random.default_rng(0)
+    for trial in range(300):
+        n = int(rng.integers(2, 300))
+        # Few distinct values, so ties (which continue a run) are common.
+        u = rng.integers(0, 5, n) if trial % 2 else rng.random(n)
+        counter = tester['RunsUpCounter']()
+        position = 0
+        while position < n:
+            step = int(rng.integers(1, 12))
+            counter.add(u[position:position + step])
+            position += step
+        assert counter.finish().tolist() == baseline_runs(u.tolist())
+        assert counter.n == n
+
+
+def test_runs_counter_handles_long_runs_across_many_chunks():
+    u = np.concatenate([np.arange(20), np.arange(3), [5.0]])
+    counter = tester['RunsUpCounter']()
+    for value in u:
+        counter.add([value])
+    assert counter.finish().tolist() == baseline_runs(u.tolist())
@@ -0,0 +1,53 @@
+import random
+
+from simkit.eventlist import HeapEventList, CalendarEventList
+
+
+def drain_both(seed, decimals):
+    # Pushes and pops on both event lists in lockstep, as the engine would:
+    # new events are never earlier than the last one popped. Rounding makes
+    # many times land on or near multiples of the calendar's bucket width.
+    rng = random.Random(seed)
+    heap = HeapEventList()
+    calendar = CalendarEventList()
+    now = 0.0
+    seq = 0
+    popped = []
+    for _ in range(2000):
+        if len(heap) and rng.random() < 0.45:
+            item = heap.pop()
+            assert calendar.pop() == item
+            now = item[0]
+            popped.append(item)
+        else:
+            scale = rng.choice([1e-5, 1e-3, 0.1, 1.0])
+            time = round(now + rng.expovariate(1.0) * scale, decimals)
+            time = max(time, now)
+            item = (time, seq, 0, None)
+            seq += 1
+            heap.push(item)
+            calendar.push(item)
+    while len(heap):
+        item = heap.pop()
+        assert calendar.pop() == item
+        popped.append(item)
+    assert len(calendar) == 0
+    return popped
+
+
+def test_calendar_matches_heap():
+    for seed in range(300):
+        drain_both(seed, decimals=6)
+
+
+def test_calendar_matches_heap_on_coarse_grid():
+    for seed in range(100):
+        drain_both(seed, decimals=2)
+
+
+def test_calendar_keeps_infinite_events_last():
+    calendar = CalendarEventList()
+    calendar.push((float('inf'), 0, 0, None))
+    calendar.push((1.0, 1, 0, None))
+    assert calendar.pop()[1] == 1
+    assert calendar.pop()[1] == 0
@@ -0,0 +1,80 @@
+import os
+import runpy
+
+import numpy as np
+import pytest
+
+from simkit.recursions import kiefer_wolfowitz, lindley
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_script(name, customers):
+    # The model scripts are not importable modules (their names have spaces),
+    # so they are run without their __main__ block and shortened.
+    namespace = runpy.run_path(os.path.join(ROOT, name), run_name='script')
+    namespace['Simulator'].run.__globals__['total_people'] = customers
+    return namespace
+
+
+def run_both(namespace, params, seed):
+    results = []
+    for fast in (False, True):
+        sim = namespace['Simulator'](seed, fast=fast)
+        sim.configure(params, namespace['States']())
+        sim.run()
+        states = sim.states
+        results.append((states.served, states.delay.mean, states.avgQlength, states.util, sim.now()))
+    return results
+
+
+def test_lindley_matches_direct_recursion():
+    rng = np.random.default_rng(3)
+    interarrivals = rng.exponential(1.0, 5000)
+    services = rng.exponential(0.9, 5000)
+    delays = [0.0]
+    for n in range(1, 5000):
+        delays.append(max(0.0, delays[-1] + services[n - 1] - interarrivals[n]))
+    assert np.allclose(lindley(interarrivals, services), delays, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('script', ['Offline_1-MM1 Server Queue.py', 'Offline_1-MM1 Server Queue Graph.py'])
+def test_mm1_fast_path_matches_event_run(script):
+    namespace = load_script(script, 3000)
+    event, fast = run_both(namespace, namespace['Params'](0.9, 1.0, 1), 7)
+    assert event[0] == fast[0] == 3000
+    assert np.allclose(event[1:], fast[1:], rtol=1e-9, atol=0)
+
+
+def brute_force_delays(interarrivals, services, k):
+    # FCFS with k servers: customer n starts once it has arrived and at most
+    # k - 1 earlier customers are still in the system, i.e. at the (n-k+1)-th
+    # earliest departure among customers 0..n-1.
+    arrivals = np.cumsum(interarrivals)
+    departures = []
+    delays = []
+    for arrival, service in zip(arrivals, services):
+        n = len(departures)
+        start = arrival if n < k else max(arrival, sorted(departures)[n - k])
+        delays.append(start - arrival)
+        departures.append(start + service)
+    return np.array(delays)
+
+
+@pytest.mark.parametrize('k', [2, 3, 5])
+def test_kiefer_wolfowitz_matches_brute_force(k):
+    rng = np.random.default_rng(k)
+    interarrivals = rng.exponential(1.0, 1500)
+    services = rng.exponential(0.95 * k, 1500)
+    expected = brute_force_delays(interarrivals, services, k)
+    assert expected.max() > 0
+    assert np.allclose(kiefer_wolfowitz(interarrivals, services, k), expected, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('k', [1, 2, 3, 4])
+def test_mmk_fast_path_matches_event_run(k):
+    namespace = load_script('Offline_1-MMK Server Queue.py', 3000)
+    event, fast = run_both(namespace, namespace['Params'](0.9 * k, 1.0, k), 11)
+    assert event[0] == fast[0] == 3000
+    assert event[1] > 0
+    assert np.allclose(event[1:], fast[1:], rtol=1e-9, atol=0)
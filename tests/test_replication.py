@@ -0,0 +1,23 @@
+import numpy as np
+
+from simkit.replication import run_replications, run_until_precision
+
+
+def noisy(point, seed):
+    rng = np.random.default_rng(seed)
+    return {'x': rng.exponential(point), 'pair': rng.random(2)}
+
+
+def test_stopping_does_not_depend_on_workers_or_batch():
+    points = [1.0, 3.0]
+    runs = [run_until_precision(noisy, points, 101, relative={'x': 0.1}, min_replications=10, workers=workers, batch=batch)
+            for workers, batch in [(1, None), (3, None), (1, 7), (2, 4)]]
+    for i in range(len(points)):
+        n = runs[0][i]['x'].n
+        assert 10 < n < 1000
+        for run in runs[1:]:
+            assert run[i]['x'].n == n
+            assert run[i]['x'].mean == runs[0][i]['x'].mean
+            assert np.array_equal(run[i]['pair'].mean, runs[0][i]['pair'].mean)
+        fixed = run_replications(noisy, points, n, 101, workers=1)[i]
+        assert fixed['x'].mean == runs[0][i]['x'].mean
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from simkit.results import ResultStore
+
+
+def test_rows_with_missing_columns_load_as_nan(tmp_path):
+    store = ResultStore(str(tmp_path / 'sweep.csv'))
+    store.extend([{'run': 'a', 'k': 1, 'util_0': 0.5}, {'run': 'a', 'k': 2, 'util_0': 0.4, 'util_1': 0.3}])
+    store.append({'run': 'b', 'k': 1, 'util_0': 0.6})
+    table = ResultStore(str(tmp_path / 'sweep.csv')).load()
+    assert np.isnan(table['util_1'][0]) and table['util_1'][1] == 0.3
+    assert table['run'].tolist() == ['a', 'a', 'b']
+
+
+def test_new_columns_go_to_a_sibling_file(tmp_path):
+    path = str(tmp_path / 'sweep.csv')
+    ResultStore(path).append({'run': 'a', 'x': 1.0})
+    store = ResultStore(path)
+    with pytest.warns(UserWarning):
+        store.append({'run': 'b', 'x': 2.0, 'y': 3.0})
+    assert store.path == str(tmp_path / 'sweep-2.csv')
+    assert store.load()['y'].tolist() == [3.0]
+    assert ResultStore(path).load()['x'].tolist() == [1.0]
+
+    # A later run with the same new columns appends to that sibling.
+    with pytest.warns(UserWarning):
+        ResultStore(path).append({'run': 'c', 'x': 4.0, 'y': 5.0})
+    assert ResultStore(str(tmp_path / 'sweep-2.csv')).load()['run'].tolist() == ['b', 'c']